@@ -1,5 +1,6 @@
-from bandits import Bandit
-import random
+from bandits import Bandit, BatchBandit
+from sumtree import SumTree
+import heapq
 import math
 import numpy as np
 
@@ -7,6 +8,7 @@ class Agent:
     def __init__(self, bandit: Bandit) -> None:
         self.bandit = bandit
         self.num_actions = bandit.getN()
+        self.randomness = bandit.randomness
 
         self.total_reward = 0
         self.iterations = 0
@@ -50,8 +52,8 @@ class EpsilonGreedyAgent(Agent):
         self.action_count = [0] * self.num_actions
     
     def choose_action(self) -> int:
-        if random.random() < self.epsilon:
-            return random.randint(0, self.num_actions - 1)
+        if self.randomness.uniform() < self.epsilon:
+            return self.randomness.integer(self.num_actions)
         else:
             return np.argmax(self.q_estimates)
 
@@ -60,44 +62,138 @@ class EpsilonGreedyAgent(Agent):
         self.q_estimates[action] += (reward - self.q_estimates[action]) / self.action_count[action]
 
 class UCBAgent(Agent):
-    def __init__(self, bandit: Bandit, exploration_param: float) -> None:
+    def __init__(self, bandit: Bandit, exploration_param: float, large_action: bool = False) -> None:
         super().__init__(bandit)
         self.c = exploration_param
         self.q_estimates = [0.0] * self.num_actions
         self.action_count = [0] * self.num_actions
 
+        # large action mode keeps a lazy max-heap of UCB upper bounds instead of scanning all arms
+        self.large_action = large_action
+        if large_action:
+            assert self.c >= 0
+            self.first_unpulled = 0
+            self.rebuild_heap()
+
+    def ucb_value(self, i: int) -> float:
+        return self.q_estimates[i] + self.c * math.sqrt(math.log(self.iterations + 1) / self.action_count[i])
+
     def choose_action(self) -> int:
+        if self.large_action:
+            return self.choose_action_large()
         for i in range(self.num_actions):
             if self.action_count[i] == 0:
                 return i
         ucb_values = [self.q_estimates[i] + self.c * math.sqrt(math.log(self.iterations + 1) / self.action_count[i]) for i in range(self.num_actions)]
         return np.argmax(ucb_values)
 
+    def heap_key(self, count: int, q: float) -> float:
+        '''Key of the arms with this (action_count, q_estimate) at the current t: q + c * sqrt(log(t + 1)) * (w - 1), w = 1 / sqrt(count).
+
+        Since w <= 1 the key only shrinks as t grows, so key + c * sqrt(log(t' + 1)) bounds their UCB value at every later t'.'''
+        return q + self.c * math.sqrt(math.log(self.iterations + 1)) * (1 / math.sqrt(count) - 1)
+
+    def rebuild_heap(self) -> None:
+        '''Groups the pulled arms by (action_count, q_estimate). Arms in a group share the same UCB value, so a group
+        is one heap entry and its lowest index is the arm np.argmax would pick among them.'''
+        self.groups = {}
+        for i in range(self.num_actions):
+            if self.action_count[i] > 0:
+                self.groups.setdefault((self.action_count[i], float(self.q_estimates[i])), []).append(i)
+        self.heap = [(-self.heap_key(*group), *group) for group in self.groups]
+        heapq.heapify(self.heap)
+        self.stale_entries = 0
+
+    def choose_action_large(self) -> int:
+        # same first-unpulled-arm rule as the scan; pulls only ever move this index forward
+        while self.first_unpulled < self.num_actions and self.action_count[self.first_unpulled] > 0:
+            self.first_unpulled += 1
+        if self.first_unpulled < self.num_actions:
+            return self.first_unpulled
+
+        bonus = self.c * math.sqrt(math.log(self.iterations + 1))
+        best_value, best_arm = -math.inf, self.num_actions
+        visited = []
+        while self.heap:
+            neg_key, count, q = self.heap[0]
+            # stop once no remaining group can reach the best exact value; slack covers rounding in the keys
+            if visited and -neg_key + bonus + 1e-12 * (1 + abs(best_value) + bonus) < best_value:
+                break
+            heapq.heappop(self.heap)
+
+            # arms leave their group lazily: a pulled arm has a higher action_count than its old group
+            members = self.groups[(count, q)]
+            while members and self.action_count[members[0]] != count:
+                heapq.heappop(members)
+            if not members:
+                del self.groups[(count, q)]
+                continue
+
+            i = members[0]
+            value = self.ucb_value(i)
+            # ties go to the lowest index, like np.argmax
+            if value > best_value or (value == best_value and i < best_arm):
+                best_value, best_arm = value, i
+            visited.append((count, q))
+
+        for group in visited:
+            heapq.heappush(self.heap, (-self.heap_key(*group), *group))
+        return best_arm
+
     def update_policy(self, action: int, reward: int) -> None:
         self.action_count[action] += 1
         self.q_estimates[action] += (reward - self.q_estimates[action]) / self.action_count[action]
+        if self.large_action:
+            group = (self.action_count[action], float(self.q_estimates[action]))
+            if group in self.groups:
+                heapq.heappush(self.groups[group], action)
+            else:
+                self.groups[group] = [action]
+                heapq.heappush(self.heap, (-self.heap_key(*group), *group))
+            # the arm's entry in its previous group is now stale
+            self.stale_entries += 1
+            if self.stale_entries > 2 * self.num_actions:
+                self.rebuild_heap()
 
 class GradientBanditAgent(Agent):
-    def __init__(self, bandit: Bandit, learning_rate: float) -> None:
+    SAMPLERS = ("cdf", "sumtree")
+
+    def __init__(self, bandit: Bandit, learning_rate: float, sampler: str = "cdf") -> None:
         super().__init__(bandit)
+        assert sampler in GradientBanditAgent.SAMPLERS
         self.alpha = learning_rate
-        self.preferences = [0.0] * self.num_actions
+        self.preferences = np.zeros(self.num_actions)
         self.avg_reward = 0.0
 
+        # softmax of the preferences, computed once per step and shared by choose_action and update_policy
+        self.action_probabilities = None
+        self.sampler = sampler
+        # every preference moves on every step, so the tree is rebuilt each step and sampling stays O(n) overall
+        if sampler == "sumtree":
+            self.tree = SumTree(self.num_actions)
+
+    def policy(self) -> np.ndarray:
+        if self.action_probabilities is None:
+            # shifting by the max keeps np.exp from overflowing without changing the softmax
+            exp_preferences = np.exp(self.preferences - np.max(self.preferences))
+            self.action_probabilities = exp_preferences / np.sum(exp_preferences)
+            if self.sampler == "sumtree":
+                self.tree.set_all(exp_preferences)
+        return self.action_probabilities
+
     def choose_action(self) -> int:
-        exp_preferences = np.exp(self.preferences)
-        action_probabilities = exp_preferences / np.sum(exp_preferences)
-        return np.random.choice(range(self.num_actions), p=action_probabilities)
+        action_probabilities = self.policy()
+        if self.sampler == "sumtree":
+            return self.tree.sample(self.randomness.uniform() * self.tree.total())
+        return self.randomness.choice(action_probabilities)
 
     def update_policy(self, action: int, reward: int) -> None:
         self.avg_reward += (reward - self.avg_reward) / (self.iterations + 1)
-        exp_preferences = np.exp(self.preferences)
-        action_probabilities = exp_preferences / np.sum(exp_preferences)
-        for i in range(self.num_actions):
-            if i == action:
-                self.preferences[i] += self.alpha * (reward - self.avg_reward) * (1 - action_probabilities[i])
-            else:
-                self.preferences[i] -= self.alpha * (reward - self.avg_reward) * action_probabilities[i]
+        step = self.alpha * (reward - self.avg_reward)
+        # H_i -= step * pi_i for every arm, and the chosen arm gets step * (1 - pi_a) in total
+        self.preferences -= step * self.policy()
+        self.preferences[action] += step
+        self.action_probabilities = None
 
 class ThompsonSamplingAgent(Agent):
     def __init__(self, bandit: Bandit) -> None:
@@ -106,7 +202,7 @@ class ThompsonSamplingAgent(Agent):
         self.failures = [1] * self.num_actions
 
     def choose_action(self) -> int:
-        sampled_theta = [np.random.beta(self.successes[i], self.failures[i]) for i in range(self.num_actions)]
+        sampled_theta = self.randomness.beta(self.successes, self.failures)
         return np.argmax(sampled_theta)
 
     def update_policy(self, action: int, reward: int) -> None:
@@ -114,3 +210,128 @@ class ThompsonSamplingAgent(Agent):
             self.successes[action] += 1
         else:
             self.failures[action] += 1
+
+
+class BatchAgent:
+    '''Runs one policy on every run of a BatchBandit at once. All state has shape (runs, n_arms).'''
+
+    def __init__(self, bandit: BatchBandit) -> None:
+        self.bandit = bandit
+        self.num_actions = bandit.getN()
+        self.randomness = bandit.randomness
+        self.num_runs = bandit.getR()
+        self.rows = np.arange(self.num_runs)
+
+        self.total_reward = np.zeros(self.num_runs)
+        self.iterations = 0
+
+    def per_run(self, value) -> np.ndarray:
+        '''Broadcasts a scalar or (runs,) hyperparameter to one value per run.'''
+        return np.broadcast_to(np.asarray(value, dtype=float), (self.num_runs,)).copy()
+
+    def choose_action(self) -> np.ndarray:
+        '''This method should be overridden to return one action per run.'''
+        raise NotImplementedError()
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        '''This method should be overridden to update every run after receiving its reward.'''
+        raise NotImplementedError()
+
+    def act(self) -> np.ndarray:
+        action = self.choose_action()
+        reward = self.bandit.choose(action)
+
+        self.total_reward += reward
+        self.iterations += 1
+
+        self.update_policy(action, reward)
+        return reward
+
+class BatchGreedyAgent(BatchAgent):
+    def __init__(self, bandit: BatchBandit, initial_value) -> None:
+        super().__init__(bandit)
+        self.q_estimates = np.repeat(self.per_run(initial_value)[:, None], self.num_actions, axis=1)
+        self.action_count = np.zeros((self.num_runs, self.num_actions), dtype=int)
+
+    def choose_action(self) -> np.ndarray:
+        return np.argmax(self.q_estimates, axis=1)
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        self.action_count[self.rows, action] += 1
+        self.q_estimates[self.rows, action] += (reward - self.q_estimates[self.rows, action]) / self.action_count[self.rows, action]
+
+class BatchEpsilonGreedyAgent(BatchAgent):
+    def __init__(self, bandit: BatchBandit, epsilon) -> None:
+        super().__init__(bandit)
+        self.epsilon = self.per_run(epsilon)
+        self.q_estimates = np.zeros((self.num_runs, self.num_actions))
+        self.action_count = np.zeros((self.num_runs, self.num_actions), dtype=int)
+
+    def choose_action(self) -> np.ndarray:
+        explore = self.randomness.uniforms(self.num_runs) < self.epsilon
+        random_actions = self.randomness.integers(self.num_actions, self.num_runs)
+        return np.where(explore, random_actions, np.argmax(self.q_estimates, axis=1))
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        self.action_count[self.rows, action] += 1
+        self.q_estimates[self.rows, action] += (reward - self.q_estimates[self.rows, action]) / self.action_count[self.rows, action]
+
+class BatchUCBAgent(BatchAgent):
+    def __init__(self, bandit: BatchBandit, exploration_param) -> None:
+        super().__init__(bandit)
+        self.c = self.per_run(exploration_param)
+        self.q_estimates = np.zeros((self.num_runs, self.num_actions))
+        self.action_count = np.zeros((self.num_runs, self.num_actions), dtype=int)
+
+    def choose_action(self) -> np.ndarray:
+        # runs that still have an unpulled arm take the first one, like UCBAgent
+        unpulled = self.action_count == 0
+        bonus = np.sqrt(math.log(self.iterations + 1) / np.maximum(self.action_count, 1))
+        ucb_values = self.q_estimates + self.c[:, None] * bonus
+        return np.where(unpulled.any(axis=1), np.argmax(unpulled, axis=1), np.argmax(ucb_values, axis=1))
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        self.action_count[self.rows, action] += 1
+        self.q_estimates[self.rows, action] += (reward - self.q_estimates[self.rows, action]) / self.action_count[self.rows, action]
+
+class BatchGradientBanditAgent(BatchAgent):
+    def __init__(self, bandit: BatchBandit, learning_rate) -> None:
+        super().__init__(bandit)
+        self.alpha = self.per_run(learning_rate)
+        self.preferences = np.zeros((self.num_runs, self.num_actions))
+        self.avg_reward = np.zeros(self.num_runs)
+        self.action_probabilities = None
+
+    def policy(self) -> np.ndarray:
+        if self.action_probabilities is None:
+            exp_preferences = np.exp(self.preferences - np.max(self.preferences, axis=1, keepdims=True))
+            self.action_probabilities = exp_preferences / np.sum(exp_preferences, axis=1, keepdims=True)
+        return self.action_probabilities
+
+    def choose_action(self) -> np.ndarray:
+        # inverse-CDF sampling of one action per run
+        cdf = np.cumsum(self.policy(), axis=1)
+        u = self.randomness.uniforms(self.num_runs)[:, None]
+        return np.minimum(np.sum(cdf < u * cdf[:, -1:], axis=1), self.num_actions - 1)
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        self.avg_reward += (reward - self.avg_reward) / (self.iterations + 1)
+        step = self.alpha * (reward - self.avg_reward)
+        self.preferences -= step[:, None] * self.policy()
+        self.preferences[self.rows, action] += step
+        self.action_probabilities = None
+
+class BatchThompsonSamplingAgent(BatchAgent):
+    def __init__(self, bandit: BatchBandit) -> None:
+        super().__init__(bandit)
+        self.successes = np.ones((self.num_runs, self.num_actions), dtype=int)
+        self.failures = np.ones((self.num_runs, self.num_actions), dtype=int)
+
+    def choose_action(self) -> np.ndarray:
+        sampled_theta = self.randomness.beta(self.successes, self.failures)
+        return np.argmax(sampled_theta, axis=1)
+
+    def update_policy(self, action: np.ndarray, reward: np.ndarray) -> None:
+        success = reward > 0
+        self.successes[self.rows, action] += success
+        self.failures[self.rows, action] += ~success
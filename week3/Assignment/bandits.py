@@ -1,14 +1,17 @@
 import numpy as np
+from randomness import GlobalRandomness
 
 class Bandit:
     '''This class describes a Bandit with n possible actions'''
 
     BANDIT_TYPES = ("Bernoulli", "Gaussian")
 
-    def __init__(self, n: int, type: str) -> None: 
+    def __init__(self, n: int, type: str, randomness=None) -> None: 
         assert type in Bandit.BANDIT_TYPES
         self.N = n
         self.type = type
+        # source of reward noise, shared with the agents playing this bandit
+        self.randomness = randomness if randomness is not None else GlobalRandomness()
         if type == "Bernoulli":
             # bandits will give reward/no reward
             self.probs = np.random.uniform(size=(n,))
@@ -35,12 +38,62 @@ class Bandit:
         assert 0 <= k < self.N
         # returns 1 with probability = self.probs[k]
         if self.type == "Bernoulli":
-            reward = np.random.binomial(1, self.probs[k])
+            reward = self.randomness.bernoulli(self.probs[k])
             self.regret += self.optimal - reward
             return reward
 
         # Returns reward based on gaussian distribution
         elif self.type == "Gaussian":
-            reward = np.random.normal(self.means[k], 1)
+            reward = self.randomness.normal(self.means[k])
             self.regret += self.optimal - reward
-            return reward
\ No newline at end of file
+            return reward
+
+class BatchBandit:
+    '''This class describes R independent Bandits with n possible actions each, pulled together in one call'''
+
+    def __init__(self, n: int, type: str, runs: int, randomness=None) -> None:
+        assert type in Bandit.BANDIT_TYPES
+        self.N = n
+        self.R = runs
+        self.type = type
+        self.randomness = randomness if randomness is not None else GlobalRandomness()
+        if type == "Bernoulli":
+            # row r holds the arm probabilities of the r-th problem instance
+            self.probs = np.random.uniform(size=(runs, n))
+            self.optimal = np.max(self.probs, axis=1)
+
+        elif type == "Gaussian":
+            self.means = np.random.normal(15, 10, (runs, n))
+            self.optimal = np.max(self.means, axis=1)
+
+        self.rows = np.arange(runs)
+        self.regret = np.zeros(runs)
+
+    # Gets the cummulative regret of every run, shape (R,)
+    def get_regret(self) -> np.ndarray:
+        return self.regret
+
+    def getN(self) -> int:
+        return self.N
+
+    def getR(self) -> int:
+        return self.R
+
+    def reset_regret(self) -> None:
+        self.regret = np.zeros(self.R)
+
+    # pull lever k[r] (0 to n-1) of every run r at once
+    def choose(self, k: np.ndarray) -> np.ndarray:
+        k = np.asarray(k)
+        assert k.shape == (self.R,)
+        assert np.all((0 <= k) & (k < self.N))
+        # returns 1 with probability = self.probs[r, k[r]] for each run
+        if self.type == "Bernoulli":
+            reward = self.randomness.bernoulli(self.probs[self.rows, k])
+
+        # Returns rewards based on gaussian distribution
+        elif self.type == "Gaussian":
+            reward = self.randomness.normal(self.means[self.rows, k])
+
+        self.regret += self.optimal - reward
+        return reward
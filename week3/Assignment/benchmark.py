@@ -0,0 +1,136 @@
+'''Steps/second of every agent in agents.py and of Bandit.choose, across arm counts and run batch sizes.
+
+    python benchmark.py --output results.json                 # measure and write JSON
+    python benchmark.py --save-baseline baseline.json         # measure and store as the new baseline
+    python benchmark.py --baseline baseline.json              # measure and fail on regressions against it
+'''
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import numpy as np
+from bandits import Bandit, BatchBandit
+from agents import *
+from randomness import GlobalRandomness, BufferedRandomness
+from simulate import simulate
+
+AGENTS = {
+    "GreedyAgent": (GreedyAgent, BatchGreedyAgent, {"initial_value": 1.0}),
+    "EpsilonGreedyAgent": (EpsilonGreedyAgent, BatchEpsilonGreedyAgent, {"epsilon": 0.1}),
+    "UCBAgent": (UCBAgent, BatchUCBAgent, {"exploration_param": 2}),
+    "GradientBanditAgent": (GradientBanditAgent, BatchGradientBanditAgent, {"learning_rate": 0.1}),
+    "ThompsonSamplingAgent": (ThompsonSamplingAgent, BatchThompsonSamplingAgent, {}),
+}
+
+# batched cases with more than this many (run, arm) cells are skipped to bound memory
+MAX_CELLS = 10 ** 7
+
+def measure(step, min_time: float) -> float:
+    '''Calls step() in doubling batches until min_time seconds have passed and returns calls per second'''
+    calls, elapsed, batch = 0, 0.0, 1
+    while elapsed < min_time:
+        start = time.perf_counter()
+        for _ in range(batch):
+            step()
+        elapsed += time.perf_counter() - start
+        calls += batch
+        batch *= 2
+    return calls / elapsed
+
+def make_randomness(kind: str, seed: int):
+    return BufferedRandomness(seed) if kind == "buffered" else GlobalRandomness()
+
+def run_benchmarks(arm_counts, batch_sizes, bandit_types, randomness: str, min_time: float, seed: int = 0) -> list:
+    results = []
+
+    # runs is the number of parallel runs a call advances, steps_per_call how many steps it advances each of them
+    def record(name, bandit_type, n, runs, calls_per_sec, steps_per_call=1):
+        steps_per_sec = calls_per_sec * runs * steps_per_call
+        results.append({"name": name, "bandit_type": bandit_type, "arms": n, "runs": runs,
+                        "steps_per_call": steps_per_call, "steps_per_sec": steps_per_sec})
+        print(f"{name:>34} {bandit_type:>10} n={n:<7} runs={runs:<6} {steps_per_sec:>14.0f} steps/s", flush=True)
+
+    for bandit_type in bandit_types:
+        for n in arm_counts:
+            np.random.seed(seed)
+            bandit = Bandit(n, bandit_type, make_randomness(randomness, seed))
+            arms = itertools.cycle(np.random.randint(0, n, 4096).tolist())
+            record("Bandit.choose", bandit_type, n, 1, measure(lambda: bandit.choose(next(arms)), min_time))
+
+            for runs in batch_sizes:
+                if runs * n > MAX_CELLS:
+                    continue
+                bandit = BatchBandit(n, bandit_type, runs, make_randomness(randomness, seed))
+                actions = np.random.randint(0, n, runs)
+                record("BatchBandit.choose", bandit_type, n, runs, measure(lambda: bandit.choose(actions), min_time))
+
+            for name, (agent_class, batch_class, kwargs) in AGENTS.items():
+                np.random.seed(seed)
+                bandit = Bandit(n, bandit_type, make_randomness(randomness, seed))
+                agent = agent_class(bandit, **kwargs)
+                record(f"{name}.act", bandit_type, n, 1, measure(agent.act, min_time))
+
+                np.random.seed(seed)
+                bandit = Bandit(n, bandit_type, make_randomness(randomness, seed))
+                agent = agent_class(bandit, **kwargs)
+                # one call simulates a block of 256 steps of a single run
+                record(f"simulate({name})", bandit_type, n, 1, measure(lambda: simulate(agent, bandit, 256), min_time),
+                       steps_per_call=256)
+
+                for runs in batch_sizes:
+                    if runs * n > MAX_CELLS:
+                        continue
+                    bandit = BatchBandit(n, bandit_type, runs, make_randomness(randomness, seed))
+                    agent = batch_class(bandit, **kwargs)
+                    record(f"{batch_class.__name__}.act", bandit_type, n, runs, measure(agent.act, min_time))
+    return results
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    '''Returns the results that are slower than their baseline entry by more than tolerance (a fraction)'''
+    key = lambda r: (r["name"], r["bandit_type"], r["arms"], r["runs"])
+    baseline = {key(r): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = baseline.get(key(r))
+        if old is not None and r["steps_per_sec"] < (1 - tolerance) * old["steps_per_sec"]:
+            regressions.append({**r, "baseline_steps_per_sec": old["steps_per_sec"],
+                                "ratio": r["steps_per_sec"] / old["steps_per_sec"]})
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arms", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, nargs="+", default=[100, 1000], help="batch sizes of the Batch* classes")
+    parser.add_argument("--bandit-types", nargs="+", default=list(Bandit.BANDIT_TYPES), choices=Bandit.BANDIT_TYPES)
+    parser.add_argument("--randomness", default="global", choices=["global", "buffered"])
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent measuring each case")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file and exit with 1 on regressions")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.arms, args.runs, args.bandit_types, args.randomness, args.min_time)
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                 "randomness": args.randomness, "min_time": args.min_time},
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['name']} {r['bandit_type']} n={r['arms']} runs={r['runs']}: "
+                  f"{r['steps_per_sec']:.0f} vs {r['baseline_steps_per_sec']:.0f} steps/s ({r['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
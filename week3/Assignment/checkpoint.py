@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import time
+import numpy as np
+from randomness import GlobalRandomness, BufferedRandomness
+from recorder import RegretRecorder
+
+# derived structures that are rebuilt from the saved state instead of being saved
+SKIPPED_AGENT_STATE = {"bandit", "randomness", "tree", "heap", "groups", "stale_entries", "action_probabilities"}
+# per-agent checkpoint statistics of a RegretRecorder; they have different lengths, so each agent's list is saved alone
+RECORDER_LISTS = ("checkpoint_steps", "avg_reward_mean", "avg_reward_var", "regret_mean", "regret_var")
+
+def pack_state(prefix: str, state: dict, arrays: dict, meta: dict) -> None:
+    '''Splits an object's attributes into arrays (lists and ndarrays) and JSON metadata (scalars, strings)'''
+    for key, value in state.items():
+        if isinstance(value, (list, np.ndarray)):
+            arrays[f"{prefix}/{key}"] = np.asarray(value)
+            meta[f"{prefix}/{key}"] = "list" if isinstance(value, list) else "array"
+        elif isinstance(value, (bool, int, float, str, np.number)) or value is None:
+            meta[f"{prefix}/{key}"] = value.item() if isinstance(value, np.number) else value
+
+def unpack_state(prefix: str, obj, arrays, meta: dict) -> None:
+    for name, value in meta.items():
+        if not name.startswith(prefix + "/"):
+            continue
+        key = name[len(prefix) + 1:]
+        if value == "list":
+            setattr(obj, key, arrays[name].tolist())
+        elif value == "array":
+            setattr(obj, key, arrays[name].copy())
+        else:
+            setattr(obj, key, value)
+
+def randomness_state(randomness, arrays: dict) -> dict:
+    if isinstance(randomness, GlobalRandomness):
+        _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+        arrays["randomness/mt19937"] = keys
+        return {"kind": "global", "pos": pos, "has_gauss": has_gauss, "cached_gaussian": cached_gaussian,
+                "python_random": random.getstate()}
+
+    assert isinstance(randomness, BufferedRandomness)
+    arrays["randomness/uniform_block"] = np.array(randomness.uniform_block, dtype=float)
+    arrays["randomness/normal_block"] = np.array(randomness.normal_block, dtype=float)
+    arrays["randomness/uniform_array"] = randomness.uniform_array
+    arrays["randomness/normal_array"] = randomness.normal_array
+    return {"kind": "buffered", "bit_generator": randomness.rng.bit_generator.state, "block_size": randomness.block_size,
+            "uniform_pos": randomness.uniform_pos, "normal_pos": randomness.normal_pos,
+            "uniform_array_pos": randomness.uniform_array_pos, "normal_array_pos": randomness.normal_array_pos}
+
+def restore_randomness(randomness, arrays, state: dict) -> None:
+    if state["kind"] == "global":
+        assert isinstance(randomness, GlobalRandomness)
+        np.random.set_state(("MT19937", arrays["randomness/mt19937"], state["pos"], state["has_gauss"], state["cached_gaussian"]))
+        version, internal, gauss_next = state["python_random"]
+        random.setstate((version, tuple(internal), gauss_next))
+        return
+
+    assert isinstance(randomness, BufferedRandomness)
+    randomness.rng.bit_generator.state = state["bit_generator"]
+    randomness.block_size = state["block_size"]
+    randomness.uniform_block = arrays["randomness/uniform_block"].tolist()
+    randomness.normal_block = arrays["randomness/normal_block"].tolist()
+    randomness.uniform_array = arrays["randomness/uniform_array"].copy()
+    randomness.normal_array = arrays["randomness/normal_array"].copy()
+    for key in ("uniform_pos", "normal_pos", "uniform_array_pos", "normal_array_pos"):
+        setattr(randomness, key, state[key])
+
+def recorder_state(recorder: RegretRecorder, arrays: dict) -> dict:
+    '''Saves the running sums and checkpoint statistics; the memory-mapped traces are only flushed, since they
+    already live on disk'''
+    arrays["recorder/cumulative_reward"] = recorder.cumulative_reward
+    arrays["recorder/regret"] = recorder.regret
+    for name in RECORDER_LISTS:
+        for i, values in enumerate(getattr(recorder, name)):
+            arrays[f"recorder/{name}/{i}"] = np.array(values, dtype=float)
+    recorder.close()
+    return {"agent_names": recorder.agent_names, "runs": recorder.runs, "t": recorder.t,
+            "next_checkpoint": recorder.next_checkpoint}
+
+def restore_recorder(recorder: RegretRecorder, arrays, state: dict) -> None:
+    assert state["agent_names"] == recorder.agent_names and state["runs"] == recorder.runs
+    recorder.cumulative_reward = arrays["recorder/cumulative_reward"].copy()
+    recorder.regret = arrays["recorder/regret"].copy()
+    for name in RECORDER_LISTS:
+        setattr(recorder, name, [arrays[f"recorder/{name}/{i}"].tolist() for i in range(len(recorder.agent_names))])
+    recorder.checkpoint_steps = [[int(t) for t in steps] for steps in recorder.checkpoint_steps]
+    recorder.t = list(state["t"])
+    recorder.next_checkpoint = list(state["next_checkpoint"])
+
+def save_checkpoint(path: str, agents, bandit, recorder=None, **histories) -> None:
+    '''Snapshots agents, their bandit, the shared randomness source, an optional RegretRecorder and any extra
+    arrays (for eg. loop positions) into one uncompressed .npz file. The file is written next to path and renamed
+    over it, so a crash while saving leaves the previous checkpoint intact.'''
+    arrays, meta = {}, {}
+    for i, agent in enumerate(agents):
+        meta[f"agent{i}/class"] = type(agent).__name__
+        pack_state(f"agent{i}", {k: v for k, v in vars(agent).items() if k not in SKIPPED_AGENT_STATE}, arrays, meta)
+    pack_state("bandit", {k: v for k, v in vars(bandit).items() if k != "randomness"}, arrays, meta)
+    meta["randomness"] = randomness_state(bandit.randomness, arrays)
+    if recorder is not None:
+        meta["recorder"] = recorder_state(recorder, arrays)
+    for key, value in histories.items():
+        arrays[f"history/{key}"] = np.asarray(value)
+
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path: str, agents, bandit, recorder=None) -> dict:
+    '''Restores a checkpoint into freshly constructed agents (same classes and order), bandit and recorder, in
+    place, so that they continue bit-identically. Returns the extra arrays passed to save_checkpoint.'''
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    meta = json.loads(str(arrays.pop("meta")))
+
+    for i, agent in enumerate(agents):
+        assert meta[f"agent{i}/class"] == type(agent).__name__
+        unpack_state(f"agent{i}", agent, arrays, meta)
+        if getattr(agent, "large_action", False):
+            agent.rebuild_heap()
+        if hasattr(agent, "action_probabilities"):
+            agent.action_probabilities = None
+    unpack_state("bandit", bandit, arrays, meta)
+    restore_randomness(bandit.randomness, arrays, meta["randomness"])
+    if recorder is not None:
+        restore_recorder(recorder, arrays, meta["recorder"])
+    return {key[len("history/"):]: value for key, value in arrays.items() if key.startswith("history/")}
+
+def evaluate_agents_resumable(agents, bandit, path: str, steps: int = 1000, interval: float = 5.0, trace_dir=None,
+                               points_per_decade: int = 20) -> RegretRecorder:
+    '''plot.evaluate_agents with a RegretRecorder that saves a checkpoint to path every `interval` seconds and, if
+    path exists, resumes from it first. The checkpoint holds the recorder's running statistics, not the histories,
+    so its size does not grow with steps; with trace_dir the full-resolution traces are memory-mapped files there
+    and are reopened on resume. The checkpoint is removed once every agent has finished.'''
+    resuming = os.path.exists(path)
+    names = [type(agent).__name__ for agent in agents]
+    # the names also name the trace files, so repeated agent classes are numbered
+    names = [f"{name}{i}" if names.count(name) > 1 else name for i, name in enumerate(names)]
+    recorder = RegretRecorder(names, points_per_decade=points_per_decade,
+                              trace_dir=trace_dir, steps=steps, trace_mode="r+" if resuming else "w+")
+    start_agent, start_step = 0, 0
+    if resuming:
+        saved = load_checkpoint(path, agents, bandit, recorder)
+        start_agent, start_step = (int(v) for v in saved["position"])
+
+    next_save = time.monotonic() + interval
+    for idx in range(start_agent, len(agents)):
+        agent = agents[idx]
+        for t in range(start_step if idx == start_agent else 0, steps):
+            recorder.record(idx, agent.act(), bandit.get_regret())
+            if time.monotonic() >= next_save:
+                save_checkpoint(path, agents, bandit, recorder, position=np.array([idx, t + 1]))
+                next_save = time.monotonic() + interval
+        bandit.reset_regret()  # Reset the bandit's regret for the next agent
+
+    recorder.close()
+    if os.path.exists(path):
+        os.remove(path)
+    return recorder
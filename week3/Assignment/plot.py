@@ -1,9 +1,25 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from bandits import Bandit
 from agents import *
+from recorder import RegretRecorder
+from runner import run_experiment
+
+def evaluate_agents(agents, bandit, steps=1000, recorder=None):
+    # With a RegretRecorder the histories are streamed into it instead of dense (agents, steps) arrays
+    if recorder is not None:
+        for idx, agent in enumerate(agents):
+            for t in range(steps):
+                reward = agent.act()
+                recorder.record(idx, reward, bandit.get_regret())
+            bandit.reset_regret()
+        recorder.close()
+        return recorder
 
-def evaluate_agents(agents, bandit, steps=1000):
     reward_history = np.zeros((len(agents), steps))
     regret_history = np.zeros((len(agents), steps))
     
@@ -18,44 +34,130 @@ def evaluate_agents(agents, bandit, steps=1000):
 
     return reward_history, regret_history
 
-def plot_agent_performance(reward_history, regret_history, agent_names):
-    # Plotting reward per step
-    plt.figure(figsize=(12, 6))
-    for i, agent_name in enumerate(agent_names):
-        plt.plot(reward_history[i], label=agent_name)
-    plt.xlabel('Steps')
-    plt.ylabel('Reward per Step')
-    plt.title('Comparison of Rewards per Step Across Agents')
-    plt.legend()
-    plt.savefig("reward_comparison.png")
-    plt.show()
-
-    # Plotting accumulated regret
-    plt.figure(figsize=(12, 6))
-    for i, agent_name in enumerate(agent_names):
-        plt.plot(regret_history[i], label=agent_name)
-    plt.xlabel('Steps')
-    plt.ylabel('Cumulative Regret')
-    plt.title('Comparison of Cumulative Regret Across Agents')
-    plt.legend()
-    plt.savefig("regret_comparison.png")
-    plt.show()
-
-# Test setup
-num_bandits = 10
-bandit = Bandit(num_bandits, "Bernoulli")
-
-# Instantiate agents
-greedy_agent = GreedyAgent(bandit, initial_value=1.0)
-epsilon_greedy_agent = EpsilonGreedyAgent(bandit, epsilon=0.1)
-ucb_agent = UCBAgent(bandit, exploration_param=2)
-gradient_agent = GradientBanditAgent(bandit, learning_rate=0.1)
-thompson_agent = ThompsonSamplingAgent(bandit)
-
-# Collect agents into a list
-agents = [greedy_agent, epsilon_greedy_agent, ucb_agent, gradient_agent, thompson_agent]
-agent_names = [type(agent).__name__ for agent in agents]
-
-# Evaluate and plot results
-reward_history, regret_history = evaluate_agents(agents, bandit, steps=1000)
-plot_agent_performance(reward_history, regret_history, agent_names)
+def minmax_indices(y, max_points):
+    # Indices of the min and max of max_points // 2 buckets, so the envelope of y survives the downsampling
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    padded = np.concatenate([y, np.full(buckets * size - n, y[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate([offsets + np.argmin(padded, axis=1), offsets + np.argmax(padded, axis=1), [0, n - 1]])
+    return np.unique(np.minimum(indices, n - 1))
+
+def lttb_indices(x, y, max_points):
+    # Largest-Triangle-Three-Buckets: from each bucket keep the point spanning the largest triangle with the
+    # previously kept point and the mean of the next bucket
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+def bucket_means(values, max_points):
+    # Means over consecutive buckets of the last axis: smooths noisy per-step rewards while downsampling
+    n = values.shape[-1]
+    edges = np.unique(np.linspace(0, n, min(n, max_points) + 1).astype(int))
+    sums = np.add.reduceat(values, edges[:-1], axis=-1)
+    return (edges[:-1] + edges[1:]) / 2 + 0.5, sums / np.diff(edges)
+
+def mean_and_band(values):
+    # Mean over runs and the half width of its 95% confidence interval; values is (steps,) or (runs, steps)
+    if values.ndim == 1:
+        return values, np.zeros_like(values)
+    return values.mean(axis=0), 1.96 * values.std(axis=0) / np.sqrt(values.shape[0])
+
+def new_figure(show):
+    # pyplot figures only when they are shown, otherwise Agg canvases that never touch a display
+    if show:
+        return plt.figure(figsize=(12, 6))
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    return figure
+
+def plot_agent_performance(reward_history, regret_history=None, agent_names=None, show=True, out_dir=".",
+                           max_points=2000, decimation="lttb"):
+    # reward_history/regret_history are (agents, steps) or (agents, runs, steps), or a RegretRecorder.
+    # Rewards are plotted as bucket means, regret downsampled with LTTB or a min/max envelope, both with 95%
+    # confidence bands across runs. With show=False the figures are rendered headless and only saved.
+    if isinstance(reward_history, RegretRecorder):
+        recorder = reward_history
+        agent_names = recorder.agent_names
+        reward_curves, regret_curves = [], []
+        for i in range(len(agent_names)):
+            steps, avg_reward, avg_reward_var, regret, regret_var = recorder.curves(i)
+            reward_curves.append((steps, avg_reward, 1.96 * np.sqrt(avg_reward_var / recorder.runs)))
+            regret_curves.append((steps, regret, 1.96 * np.sqrt(regret_var / recorder.runs)))
+    else:
+        reward_curves, regret_curves = [], []
+        for rewards, regrets in zip(reward_history, regret_history):
+            rewards, regrets = np.asarray(rewards, dtype=float), np.asarray(regrets, dtype=float)
+            x, bucketed = bucket_means(rewards, max_points)
+            reward_curves.append((x, *mean_and_band(bucketed)))
+
+            mean, band = mean_and_band(regrets)
+            x = np.arange(1, len(mean) + 1)
+            idx = lttb_indices(x, mean, max_points) if decimation == "lttb" else minmax_indices(mean, max_points)
+            regret_curves.append((x[idx], mean[idx], band[idx]))
+
+    for curves, ylabel, title, file_name in [
+        (reward_curves, 'Reward per Step', 'Comparison of Rewards per Step Across Agents', "reward_comparison.png"),
+        (regret_curves, 'Cumulative Regret', 'Comparison of Cumulative Regret Across Agents', "regret_comparison.png"),
+    ]:
+        figure = new_figure(show)
+        ax = figure.subplots()
+        for (x, mean, band), agent_name in zip(curves, agent_names):
+            line, = ax.plot(x, mean, label=agent_name)
+            if np.any(band > 0):
+                ax.fill_between(x, mean - band, mean + band, color=line.get_color(), alpha=0.2)
+        ax.set_xlabel('Steps')
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.legend()
+        figure.savefig(os.path.join(out_dir, file_name))
+
+    if show:
+        plt.show()
+
+def render_job(job):
+    reward_history, regret_history, agent_names, out_dir = job
+    os.makedirs(out_dir, exist_ok=True)
+    plot_agent_performance(reward_history, regret_history, agent_names, show=False, out_dir=out_dir)
+    return out_dir
+
+def render_many(jobs, workers=None):
+    # Renders many (reward_history, regret_history, agent_names, out_dir) figure pairs headless in a process pool
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(render_job, jobs))
+
+if __name__ == "__main__":
+    # Test setup
+    num_bandits = 10
+    steps = 1000
+
+    # Agent configs: each one is played on its own independently seeded bandit
+    agent_configs = [
+        (GreedyAgent, {"initial_value": 1.0}),
+        (EpsilonGreedyAgent, {"epsilon": 0.1}),
+        (UCBAgent, {"exploration_param": 2}),
+        (GradientBanditAgent, {"learning_rate": 0.1}),
+        (ThompsonSamplingAgent, {}),
+    ]
+    agent_names = [agent_class.__name__ for agent_class, _ in agent_configs]
+
+    # Evaluate over seeds x bandit instances in parallel and plot the averages
+    reward_history, regret_history = run_experiment(agent_configs, seeds=range(10), bandit_seeds=range(10),
+                                                    n=num_bandits, bandit_type="Bernoulli", steps=steps)
+    runs_shape = (len(agent_configs), -1, steps)
+    plot_agent_performance(reward_history.reshape(runs_shape), regret_history.reshape(runs_shape), agent_names)
@@ -0,0 +1,111 @@
+import random
+import numpy as np
+
+class GlobalRandomness:
+    '''Draws every random number on demand from the global `random`/`np.random` state, one call per draw.
+    This is the default source of Bandit and Agent, so seeding with np.random.seed keeps working as before.'''
+
+    def uniform(self) -> float:
+        return random.random()
+
+    def integer(self, n: int) -> int:
+        return random.randint(0, n - 1)
+
+    def bernoulli(self, p):
+        return np.random.binomial(1, p)
+
+    # unit variance reward noise around mean
+    def normal(self, mean):
+        return np.random.normal(mean, 1)
+
+    def beta(self, a, b, size=None) -> np.ndarray:
+        return np.random.beta(a, b, size)
+
+    def choice(self, probs) -> int:
+        return np.random.choice(len(probs), p=probs)
+
+    def uniforms(self, size: int) -> np.ndarray:
+        return np.random.random(size)
+
+    def standard_normals(self, size: int) -> np.ndarray:
+        return np.random.standard_normal(size)
+
+    def integers(self, n: int, size: int) -> np.ndarray:
+        return np.random.randint(0, n, size)
+
+
+class BufferedRandomness:
+    '''Pre-draws uniforms and reward noise from a np.random.Generator in blocks of block_size and hands them out in order.
+    Scalar draws come from Python lists so that a single draw in the agent/bandit hot loop costs a list lookup.'''
+
+    def __init__(self, seed=None, block_size: int = 1 << 16) -> None:
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.block_size = block_size
+
+        # blocks for scalar draws (lists) and for batched draws (arrays)
+        self.uniform_block, self.uniform_pos = [], 0
+        self.normal_block, self.normal_pos = [], 0
+        self.uniform_array, self.uniform_array_pos = np.empty(0), 0
+        self.normal_array, self.normal_array_pos = np.empty(0), 0
+
+    def uniform(self) -> float:
+        if self.uniform_pos == len(self.uniform_block):
+            self.uniform_block = self.rng.random(self.block_size).tolist()
+            self.uniform_pos = 0
+        u = self.uniform_block[self.uniform_pos]
+        self.uniform_pos += 1
+        return u
+
+    def standard_normal(self) -> float:
+        if self.normal_pos == len(self.normal_block):
+            self.normal_block = self.rng.standard_normal(self.block_size).tolist()
+            self.normal_pos = 0
+        z = self.normal_block[self.normal_pos]
+        self.normal_pos += 1
+        return z
+
+    def integer(self, n: int) -> int:
+        return int(self.uniform() * n)
+
+    def bernoulli(self, p):
+        if not isinstance(p, np.ndarray):
+            return 1 if self.uniform() < p else 0
+        return (self.uniforms(np.size(p)).reshape(np.shape(p)) < p).astype(int)
+
+    # unit variance reward noise around mean
+    def normal(self, mean):
+        if not isinstance(mean, np.ndarray):
+            return mean + self.standard_normal()
+        return mean + self.standard_normals(np.size(mean)).reshape(np.shape(mean))
+
+    def beta(self, a, b, size=None) -> np.ndarray:
+        # the shape parameters change after every pull, so these cannot be drawn ahead; one vectorized call instead of n
+        return self.rng.beta(a, b, size)
+
+    def choice(self, probs) -> int:
+        # inverse CDF: one buffered uniform instead of np.random.choice validating probs on every call
+        cdf = np.cumsum(probs)
+        return min(int(np.searchsorted(cdf, self.uniform() * cdf[-1], side="right")), len(cdf) - 1)
+
+    def uniforms(self, size: int) -> np.ndarray:
+        if size > self.block_size:
+            return self.rng.random(size)
+        if self.uniform_array_pos + size > len(self.uniform_array):
+            self.uniform_array = self.rng.random(self.block_size)
+            self.uniform_array_pos = 0
+        values = self.uniform_array[self.uniform_array_pos:self.uniform_array_pos + size]
+        self.uniform_array_pos += size
+        return values
+
+    def standard_normals(self, size: int) -> np.ndarray:
+        if size > self.block_size:
+            return self.rng.standard_normal(size)
+        if self.normal_array_pos + size > len(self.normal_array):
+            self.normal_array = self.rng.standard_normal(self.block_size)
+            self.normal_array_pos = 0
+        values = self.normal_array[self.normal_array_pos:self.normal_array_pos + size]
+        self.normal_array_pos += size
+        return values
+
+    def integers(self, n: int, size: int) -> np.ndarray:
+        return (self.uniforms(size) * n).astype(int)
@@ -0,0 +1,98 @@
+import os
+import numpy as np
+
+class RegretRecorder:
+    '''Streams the reward and regret of every agent step by step and keeps only running statistics:
+    per-run cumulative reward/regret and, at log-spaced checkpoints, the mean and variance across runs.
+    Memory does not grow with the horizon, except for the optional full-resolution traces, which are
+    written to memory-mapped .npy files under trace_dir (this needs the horizon `steps` up front). trace_mode="r+"
+    reopens existing traces instead of creating new ones, to continue a recording restored from a checkpoint.'''
+
+    def __init__(self, agent_names, runs: int = 1, points_per_decade: int = 20, trace_dir=None, steps=None,
+                 trace_mode: str = "w+") -> None:
+        self.agent_names = list(agent_names)
+        self.runs = runs
+        self.growth = 10 ** (1 / points_per_decade)
+
+        num_agents = len(self.agent_names)
+        self.t = [0] * num_agents
+        self.cumulative_reward = np.zeros((num_agents, runs))
+        self.regret = np.zeros((num_agents, runs))
+        self.next_checkpoint = [1] * num_agents
+
+        # statistics across runs at the checkpoints, one list per agent
+        self.checkpoint_steps = [[] for _ in range(num_agents)]
+        self.avg_reward_mean = [[] for _ in range(num_agents)]
+        self.avg_reward_var = [[] for _ in range(num_agents)]
+        self.regret_mean = [[] for _ in range(num_agents)]
+        self.regret_var = [[] for _ in range(num_agents)]
+
+        self.reward_traces = self.regret_traces = None
+        if trace_dir is not None:
+            assert steps is not None, "full-resolution traces need the number of steps"
+            os.makedirs(trace_dir, exist_ok=True)
+            # shape (steps, runs) so that every step writes one contiguous row
+            shape = (steps, runs) if trace_mode == "w+" else None
+            self.reward_traces = [np.lib.format.open_memmap(os.path.join(trace_dir, f"{name}_reward.npy"), mode=trace_mode, shape=shape)
+                                  for name in self.agent_names]
+            self.regret_traces = [np.lib.format.open_memmap(os.path.join(trace_dir, f"{name}_regret.npy"), mode=trace_mode, shape=shape)
+                                  for name in self.agent_names]
+
+    def checkpoint(self, agent: int, t: int, cumulative_reward: np.ndarray, regret: np.ndarray) -> None:
+        self.checkpoint_steps[agent].append(t)
+        self.avg_reward_mean[agent].append(np.mean(cumulative_reward) / t)
+        self.avg_reward_var[agent].append(np.var(cumulative_reward / t))
+        self.regret_mean[agent].append(np.mean(regret))
+        self.regret_var[agent].append(np.var(regret))
+        while self.next_checkpoint[agent] <= t:
+            self.next_checkpoint[agent] = max(self.next_checkpoint[agent] + 1, int(self.next_checkpoint[agent] * self.growth))
+
+    def record(self, agent: int, reward, regret) -> None:
+        '''Records one step of an agent; reward and regret are scalars or arrays with one value per run.'''
+        t = self.t[agent] + 1
+        self.t[agent] = t
+        self.cumulative_reward[agent] += reward
+        self.regret[agent] = regret
+        if self.reward_traces is not None:
+            self.reward_traces[agent][t - 1] = reward
+            self.regret_traces[agent][t - 1] = regret
+        if t >= self.next_checkpoint[agent]:
+            self.checkpoint(agent, t, self.cumulative_reward[agent], self.regret[agent])
+
+    def record_block(self, agent: int, rewards: np.ndarray, regrets: np.ndarray) -> None:
+        '''Records several consecutive steps at once; arrays of shape (steps,) or (steps, runs).'''
+        rewards = np.asarray(rewards, dtype=float).reshape(len(rewards), -1)
+        regrets = np.asarray(regrets, dtype=float).reshape(len(regrets), -1)
+        t0 = self.t[agent]
+        cumulative_rewards = self.cumulative_reward[agent] + np.cumsum(rewards, axis=0)
+        if self.reward_traces is not None:
+            self.reward_traces[agent][t0:t0 + len(rewards)] = rewards
+            self.regret_traces[agent][t0:t0 + len(rewards)] = regrets
+
+        while self.next_checkpoint[agent] <= t0 + len(rewards):
+            t = self.next_checkpoint[agent]
+            self.checkpoint(agent, t, cumulative_rewards[t - t0 - 1], regrets[t - t0 - 1])
+
+        self.t[agent] = t0 + len(rewards)
+        self.cumulative_reward[agent] = cumulative_rewards[-1]
+        self.regret[agent] = regrets[-1]
+
+    def curves(self, agent: int):
+        '''Returns checkpoint steps, mean and variance of the average reward and mean and variance of the regret
+        of an agent as arrays, ending at the latest step.'''
+        steps = list(self.checkpoint_steps[agent])
+        avg_reward, avg_reward_var = list(self.avg_reward_mean[agent]), list(self.avg_reward_var[agent])
+        regret, regret_var = list(self.regret_mean[agent]), list(self.regret_var[agent])
+        t = self.t[agent]
+        if t > 0 and (not steps or steps[-1] != t):
+            steps.append(t)
+            avg_reward.append(np.mean(self.cumulative_reward[agent]) / t)
+            avg_reward_var.append(np.var(self.cumulative_reward[agent] / t))
+            regret.append(np.mean(self.regret[agent]))
+            regret_var.append(np.var(self.regret[agent]))
+        return np.array(steps), np.array(avg_reward), np.array(avg_reward_var), np.array(regret), np.array(regret_var)
+
+    def close(self) -> None:
+        if self.reward_traces is not None:
+            for trace in self.reward_traces + self.regret_traces:
+                trace.flush()
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from bandits import Bandit
+
+# one logged pull: 12 bytes on disk, read back with np.memmap
+LOG_DTYPE = np.dtype([("arm", "<i4"), ("reward", "<f4"), ("propensity", "<f4")])
+
+class LogWriter:
+    '''Appends (arm, reward, propensity) records to a raw binary log, buffering block_size records in memory'''
+
+    def __init__(self, path: str, block_size: int = 1 << 16) -> None:
+        self.file = open(path, "ab")
+        self.block = np.zeros(block_size, dtype=LOG_DTYPE)
+        self.size = 0
+
+    def write(self, arm: int, reward: float, propensity: float) -> None:
+        self.block[self.size] = (arm, reward, propensity)
+        self.size += 1
+        if self.size == len(self.block):
+            self.flush()
+
+    def write_many(self, arms, rewards, propensities) -> None:
+        self.flush()
+        records = np.zeros(len(arms), dtype=LOG_DTYPE)
+        records["arm"], records["reward"], records["propensity"] = arms, rewards, propensities
+        self.file.write(records.tobytes())
+
+    def flush(self) -> None:
+        self.file.write(self.block[:self.size].tobytes())
+        self.size = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def open_log(path: str) -> np.memmap:
+    '''Memory-maps a log without reading it'''
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=LOG_DTYPE)
+    return np.memmap(path, dtype=LOG_DTYPE, mode="r")
+
+def record_log(bandit: Bandit, steps: int, path: str, block_size: int = 1 << 16) -> None:
+    '''Appends `steps` pulls of a uniformly random logging policy (propensity 1/n each) to path, the policy for which the
+    replay method is unbiased'''
+    n = bandit.getN()
+    with LogWriter(path) as writer:
+        for start in range(0, steps, block_size):
+            size = min(block_size, steps - start)
+            arms = bandit.randomness.integers(n, size)
+            rewards = [bandit.choose(k) for k in arms.tolist()]
+            writer.write_many(arms, rewards, np.full(size, 1 / n))
+
+def replay_evaluate(agents, path: str, chunk_size: int = 1 << 20) -> list:
+    '''Scores agents against a logged interaction file in one streaming pass, chunk_size records at a time.
+
+    Replay: an agent only sees the records whose logged arm equals the arm it chooses; on those it is updated
+    like in Agent.act and collects the logged reward. IPS: reward / propensity on matching records, averaged over
+    all records, estimates the mean reward of the policy as it evolves. Agents are only asked for actions; they
+    never pull their bandit. Returns one dict of statistics per agent.'''
+    log = open_log(path)
+    stats = [{"records": 0, "matched": 0, "replay_reward": 0.0, "ips_reward": 0.0} for _ in agents]
+
+    for start in range(0, len(log), chunk_size):
+        chunk = log[start:start + chunk_size]
+        arms = chunk["arm"].tolist()
+        rewards = chunk["reward"].tolist()
+        propensities = chunk["propensity"].tolist()
+
+        for agent, stat in zip(agents, stats):
+            matched, replay_reward, ips_reward = 0, 0.0, 0.0
+            for arm, reward, propensity in zip(arms, rewards, propensities):
+                if agent.choose_action() != arm:
+                    continue
+                agent.total_reward += reward
+                agent.iterations += 1
+                agent.update_policy(arm, reward)
+                matched += 1
+                replay_reward += reward
+                ips_reward += reward / propensity
+            stat["records"] += len(arms)
+            stat["matched"] += matched
+            stat["replay_reward"] += replay_reward
+            stat["ips_reward"] += ips_reward
+
+    for stat in stats:
+        stat["replay_mean_reward"] = stat["replay_reward"] / stat["matched"] if stat["matched"] else float("nan")
+        stat["ips_mean_reward"] = stat["ips_reward"] / stat["records"] if stat["records"] else float("nan")
+    return stats
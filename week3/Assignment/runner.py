@@ -0,0 +1,45 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from bandits import Bandit
+from randomness import BufferedRandomness
+
+def run_job(job):
+    '''Plays one agent config on its own freshly seeded bandit and returns its reward and regret histories'''
+    agent_class, agent_kwargs, n, bandit_type, seed, bandit_seed, steps = job
+
+    # the bandit instance (arm probabilities/means) only depends on bandit_seed,
+    # the reward noise and the agent's own randomness on (seed, bandit_seed)
+    np.random.seed(bandit_seed)
+    bandit = Bandit(n, bandit_type, randomness=BufferedRandomness([seed, bandit_seed]))
+    agent = agent_class(bandit, **agent_kwargs)
+
+    rewards = np.zeros(steps)
+    regrets = np.zeros(steps)
+    for t in range(steps):
+        rewards[t] = agent.act()
+        regrets[t] = bandit.get_regret()
+    return rewards, regrets
+
+def run_experiment(agent_configs, seeds, bandit_seeds, n, bandit_type="Bernoulli", steps=1000, workers=None):
+    '''Runs every (agent config, seed, bandit instance) job in a process pool.
+
+    agent_configs is a list of (AgentClass, kwargs) pairs, for eg. (EpsilonGreedyAgent, {"epsilon": 0.1}).
+    Returns reward_history and regret_history of shape (len(agent_configs), len(seeds), len(bandit_seeds), steps).'''
+    shape = (len(agent_configs), len(seeds), len(bandit_seeds))
+    reward_history = np.zeros((*shape, steps))
+    regret_history = np.zeros((*shape, steps))
+
+    jobs = [(agent_class, agent_kwargs, n, bandit_type, seed, bandit_seed, steps)
+            for agent_class, agent_kwargs in agent_configs
+            for seed in seeds
+            for bandit_seed in bandit_seeds]
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(jobs) // (4 * workers))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for idx, (rewards, regrets) in enumerate(pool.map(run_job, jobs, chunksize=chunksize)):
+            reward_history[np.unravel_index(idx, shape)] = rewards
+            regret_history[np.unravel_index(idx, shape)] = regrets
+
+    return reward_history, regret_history
@@ -0,0 +1,351 @@
+import math
+from bisect import bisect_right
+from itertools import accumulate
+import numpy as np
+from bandits import Bandit
+from agents import *
+
+# Steps whose randomness is drawn at once; large enough to amortize the draws, small enough to stay in cache
+BLOCK_SIZE = 4096
+# Up to this many arms, the UCB, gradient and Thompson kernels keep their per-arm state in Python lists: a list
+# comprehension over a few arms is cheaper than the fixed cost of a NumPy call, which wins again for more arms
+SMALL_ARMS = 32
+
+def reward_noise(bandit: Bandit, size: int) -> list:
+    '''Uniforms (Bernoulli) or standard normals (Gaussian) from which the next `size` rewards are made'''
+    if bandit.type == "Bernoulli":
+        return bandit.randomness.uniforms(size).tolist()
+    return bandit.randomness.standard_normals(size).tolist()
+
+def arm_values(bandit: Bandit) -> list:
+    return (bandit.probs if bandit.type == "Bernoulli" else bandit.means).tolist()
+
+def sample_average_kernel(agent, bandit, steps, rewards_out):
+    '''GreedyAgent and EpsilonGreedyAgent: the greedy arm is tracked incrementally instead of an argmax per step'''
+    n = agent.num_actions
+    epsilon = getattr(agent, "epsilon", 0.0)
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    q = [float(v) for v in agent.q_estimates]
+    count = list(agent.action_count)
+    best = int(np.argmax(q))
+    randomness = agent.randomness
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        coins = randomness.uniforms(size).tolist() if epsilon > 0 else [1.0] * size
+        explore_arms = randomness.integers(n, size).tolist() if epsilon > 0 else None
+        rewards = [0.0] * size
+        for j in range(size):
+            k = explore_arms[j] if coins[j] < epsilon else best
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+
+            old_q = q[k]
+            count[k] += 1
+            q[k] += (reward - q[k]) / count[k]
+            if k == best:
+                if q[k] < old_q:
+                    # the greedy arm went down, rescan (max returns the first maximum, like np.argmax)
+                    best = max(range(n), key=q.__getitem__)
+            elif q[k] > q[best] or (q[k] == q[best] and k < best):
+                best = k
+        rewards_out[start:start + size] = rewards
+
+    agent.q_estimates = q
+    agent.action_count = count
+
+def ucb_kernel(agent, bandit, steps, rewards_out):
+    '''UCBAgent: pulls every arm once, then one argmax of the UCB values per step, over lists for few arms and
+    vectorized otherwise'''
+    n = agent.num_actions
+    if n <= SMALL_ARMS:
+        return ucb_small_kernel(agent, bandit, steps, rewards_out)
+    c = agent.c
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    q = np.array(agent.q_estimates, dtype=float)
+    count = np.array(agent.action_count, dtype=float)
+    # 1 / sqrt(count) only changes for the pulled arm, so the bonus is one scalar times this array
+    inv_sqrt_count = 1 / np.sqrt(np.maximum(count, 1))
+    t = agent.iterations
+    first_unpulled = 0
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        rewards = [0.0] * size
+        for j in range(size):
+            while first_unpulled < n and count[first_unpulled] > 0:
+                first_unpulled += 1
+            if first_unpulled < n:
+                k = first_unpulled
+            else:
+                k = int(np.argmax(q + (c * math.sqrt(math.log(t + 1))) * inv_sqrt_count))
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+
+            t += 1
+            count[k] += 1
+            q[k] += (reward - q[k]) / count[k]
+            inv_sqrt_count[k] = 1 / math.sqrt(count[k])
+        rewards_out[start:start + size] = rewards
+
+    agent.q_estimates = q.tolist()
+    agent.action_count = count.astype(int).tolist()
+    if agent.large_action:
+        agent.rebuild_heap()
+
+def ucb_rescan(q, inv_sqrt_count, scale):
+    '''Full scan at scale: returns the argmax, the best arm among the others and the scale up to which that
+    runner-up stays the best of the others (values are lines in the scale, and the scale only grows)'''
+    values = [value + scale * bonus for value, bonus in zip(q, inv_sqrt_count)]
+    best = values.index(max(values))
+    values[best] = -math.inf
+    runner_up = values.index(max(values))
+    valid_until = math.inf
+    q_runner_up, bonus_runner_up = q[runner_up], inv_sqrt_count[runner_up]
+    for i, (value, bonus) in enumerate(zip(q, inv_sqrt_count)):
+        if i != best and bonus > bonus_runner_up:
+            # arm i's steeper line catches up with the runner-up's at this scale
+            valid_until = min(valid_until, (q_runner_up - value) / (bonus - bonus_runner_up))
+    return best, runner_up, valid_until
+
+def ucb_small_kernel(agent, bandit, steps, rewards_out):
+    '''The arm just pulled is the only one whose line changes, so each step compares it with the cached best of
+    the other arms and rescans all arms only when the argmax moves to another arm or the scale passes the point
+    where the cached runner-up could be overtaken'''
+    n = agent.num_actions
+    c = agent.c
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    q = [float(v) for v in agent.q_estimates]
+    count = list(agent.action_count)
+    inv_sqrt_count = [1 / math.sqrt(max(k, 1)) for k in count]
+    t = agent.iterations
+    first_unpulled = 0
+    best = runner_up = -1
+    valid_until = -math.inf
+    sqrt, log = math.sqrt, math.log
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        rewards = [0.0] * size
+        for j in range(size):
+            while first_unpulled < n and count[first_unpulled] > 0:
+                first_unpulled += 1
+            if first_unpulled < n:
+                k = first_unpulled
+            else:
+                scale = c * sqrt(log(t + 1))
+                k = -1
+                if scale < valid_until:
+                    best_value = q[best] + scale * inv_sqrt_count[best]
+                    runner_up_value = q[runner_up] + scale * inv_sqrt_count[runner_up]
+                    # ties go to the lower index, like np.argmax
+                    if best_value > runner_up_value or (best_value == runner_up_value and best < runner_up):
+                        k = best
+                if k < 0:
+                    best, runner_up, valid_until = ucb_rescan(q, inv_sqrt_count, scale)
+                    k = best
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+
+            t += 1
+            count[k] += 1
+            q[k] += (reward - q[k]) / count[k]
+            inv_sqrt_count[k] = 1 / sqrt(count[k])
+        rewards_out[start:start + size] = rewards
+
+    agent.q_estimates = q
+    agent.action_count = count
+    if agent.large_action:
+        agent.rebuild_heap()
+
+def gradient_kernel(agent, bandit, steps, rewards_out):
+    '''GradientBanditAgent: softmax, inverse-CDF sampling and the preference update on local lists for few arms,
+    on local arrays otherwise'''
+    n = agent.num_actions
+    if n <= SMALL_ARMS:
+        return gradient_small_kernel(agent, bandit, steps, rewards_out)
+    alpha = agent.alpha
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    preferences = agent.preferences.copy()
+    avg_reward = agent.avg_reward
+    t = agent.iterations
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        coins = agent.randomness.uniforms(size).tolist()
+        rewards = [0.0] * size
+        for j in range(size):
+            # the update keeps the preferences summing to zero, so the unshifted exp only overflows for huge preferences
+            exp_preferences = np.exp(preferences)
+            cdf = np.cumsum(exp_preferences)
+            total = cdf[-1]
+            if not total < math.inf:
+                exp_preferences = np.exp(preferences - preferences.max())
+                cdf = np.cumsum(exp_preferences)
+                total = cdf[-1]
+            k = min(int(np.searchsorted(cdf, coins[j] * total, side="right")), n - 1)
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+
+            t += 1
+            avg_reward += (reward - avg_reward) / (t + 1)
+            step = alpha * (reward - avg_reward)
+            preferences -= (step / total) * exp_preferences
+            preferences[k] += step
+        rewards_out[start:start + size] = rewards
+
+    agent.preferences = preferences
+    agent.avg_reward = avg_reward
+    agent.action_probabilities = None
+
+def gradient_small_kernel(agent, bandit, steps, rewards_out):
+    n = agent.num_actions
+    alpha = agent.alpha
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    preferences = agent.preferences.tolist()
+    avg_reward = agent.avg_reward
+    t = agent.iterations
+    exp = math.exp
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        coins = agent.randomness.uniforms(size).tolist()
+        rewards = [0.0] * size
+        for j in range(size):
+            try:
+                exp_preferences = list(map(exp, preferences))
+            except OverflowError:
+                shift = max(preferences)
+                exp_preferences = [exp(p - shift) for p in preferences]
+            cdf = list(accumulate(exp_preferences))
+            total = cdf[-1]
+            k = min(bisect_right(cdf, coins[j] * total), n - 1)
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+
+            t += 1
+            avg_reward += (reward - avg_reward) / (t + 1)
+            step = alpha * (reward - avg_reward)
+            scale = step / total
+            preferences = [p - scale * e for p, e in zip(preferences, exp_preferences)]
+            preferences[k] += step
+        rewards_out[start:start + size] = rewards
+
+    agent.preferences = np.array(preferences)
+    agent.avg_reward = avg_reward
+    agent.action_probabilities = None
+
+def thompson_kernel(agent, bandit, steps, rewards_out):
+    '''ThompsonSamplingAgent: one vectorized beta draw per step over integer success/failure arrays, or for few
+    arms the block scheme of thompson_small_kernel'''
+    if agent.num_actions <= SMALL_ARMS:
+        return thompson_small_kernel(agent, bandit, steps, rewards_out)
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    successes = np.array(agent.successes)
+    failures = np.array(agent.failures)
+    beta = agent.randomness.beta
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        rewards = [0.0] * size
+        for j in range(size):
+            k = int(np.argmax(beta(successes, failures)))
+            reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+            rewards[j] = reward
+            if reward > 0:
+                successes[k] += 1
+            else:
+                failures[k] += 1
+        rewards_out[start:start + size] = rewards
+
+    agent.successes = successes.tolist()
+    agent.failures = failures.tolist()
+
+# steps per block of thompson_small_kernel's pre-drawn samples
+THOMPSON_BLOCK = 8
+
+def thompson_small_kernel(agent, bandit, steps, rewards_out):
+    '''Draws each arm's samples for THOMPSON_BLOCK steps at once from its current posterior, one call with scalar
+    shape parameters per arm (NumPy's fast path). A step pulls one arm, so only that arm's posterior changes: its
+    samples for the rest of the block are redrawn right away, and every step still sees an independent draw from
+    every arm's current posterior.'''
+    n = agent.num_actions
+    bernoulli = bandit.type == "Bernoulli"
+    arms = arm_values(bandit)
+    successes = list(agent.successes)
+    failures = list(agent.failures)
+    beta = agent.randomness.beta
+
+    for start in range(0, steps, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, steps - start)
+        noise = reward_noise(bandit, size)
+        rewards = [0.0] * size
+        for block_start in range(0, size, THOMPSON_BLOCK):
+            block_size = min(THOMPSON_BLOCK, size - block_start)
+            # samples[arm][i] is the arm's draw for step block_start + i
+            samples = [beta(successes[arm], failures[arm], block_size).tolist() for arm in range(n)]
+            for i in range(block_size):
+                row = [arm_samples[i] for arm_samples in samples]
+                k = row.index(max(row))
+                j = block_start + i
+                reward = (1 if noise[j] < arms[k] else 0) if bernoulli else arms[k] + noise[j]
+                rewards[j] = reward
+                if reward > 0:
+                    successes[k] += 1
+                else:
+                    failures[k] += 1
+                if i + 1 < block_size:
+                    # padded in front so that the rest of the block keeps indexing by i
+                    samples[k] = [0.0] * (i + 1) + beta(successes[k], failures[k], block_size - i - 1).tolist()
+        rewards_out[start:start + size] = rewards
+
+    agent.successes = successes
+    agent.failures = failures
+
+KERNELS = {
+    GreedyAgent: sample_average_kernel,
+    EpsilonGreedyAgent: sample_average_kernel,
+    UCBAgent: ucb_kernel,
+    GradientBanditAgent: gradient_kernel,
+    ThompsonSamplingAgent: thompson_kernel,
+}
+
+def simulate(agent: Agent, bandit: Bandit, steps: int, rewards_out=None, regret_out=None):
+    '''Plays `steps` steps of agent on bandit, the same as calling agent.act() `steps` times.
+
+    Agents in KERNELS run in one tight loop on local state, with the randomness drawn in blocks from bandit.randomness;
+    the random draws differ from the act() loop but follow the same distributions. Other agents fall back to act().
+    Measured with benchmark.py on 10 arms with buffered randomness, steps/second against the act() loop: about 10x
+    for GreedyAgent, EpsilonGreedyAgent and UCBAgent on Bernoulli bandits (5-6x for the sample-average agents on
+    Gaussian ones), 5-6x for GradientBanditAgent, whose every step touches every arm, and about 3x for
+    ThompsonSamplingAgent, which needs a fresh beta draw per arm and step.
+    Rewards and cumulative regret after every step are written into rewards_out/regret_out (allocated if None).'''
+    assert agent.bandit is bandit
+    rewards_out = np.empty(steps) if rewards_out is None else rewards_out
+    regret_out = np.empty(steps) if regret_out is None else regret_out
+
+    kernel = KERNELS.get(type(agent))
+    if kernel is None:
+        for t in range(steps):
+            rewards_out[t] = agent.act()
+            regret_out[t] = bandit.get_regret()
+        return rewards_out, regret_out
+
+    kernel(agent, bandit, steps, rewards_out)
+    regret_out[:steps] = bandit.get_regret() + np.cumsum(bandit.optimal - rewards_out[:steps])
+    bandit.regret = regret_out[steps - 1] if steps else bandit.regret
+    agent.total_reward += np.sum(rewards_out[:steps])
+    agent.iterations += steps
+    return rewards_out, regret_out
@@ -0,0 +1,46 @@
+import numpy as np
+
+class SumTree:
+    '''Binary tree over n non-negative weights where every node holds the sum of its children.
+    Sampling an index with probability proportional to its weight walks one root-to-leaf path, O(log n).'''
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.capacity = 1
+        while self.capacity < n:
+            self.capacity *= 2
+        # node k has children 2k and 2k + 1, leaves live at [capacity, 2 * capacity)
+        self.tree = np.zeros(2 * self.capacity)
+
+    def total(self) -> float:
+        return self.tree[1]
+
+    def set_all(self, weights: np.ndarray) -> None:
+        '''Replaces every weight and rebuilds the tree one level at a time with vectorized pair sums.'''
+        self.tree[self.capacity:self.capacity + self.n] = weights
+        lo = self.capacity
+        while lo > 1:
+            lo //= 2
+            self.tree[lo:2 * lo] = self.tree[2 * lo:4 * lo:2] + self.tree[2 * lo + 1:4 * lo:2]
+
+    def update(self, i: int, weight: float) -> None:
+        '''Changes one weight and the sums on its path to the root, O(log n).'''
+        k = i + self.capacity
+        change = weight - self.tree[k]
+        while k >= 1:
+            self.tree[k] += change
+            k //= 2
+
+    def sample(self, u: float) -> int:
+        '''Returns the index whose cumulative weight interval contains u, for u in [0, total()).'''
+        tree = self.tree
+        k = 1
+        while k < self.capacity:
+            left = 2 * k
+            if u < tree[left]:
+                k = left
+            else:
+                u -= tree[left]
+                k = left + 1
+        # rounding can walk past the last real leaf into zero padding
+        return min(k - self.capacity, self.n - 1)
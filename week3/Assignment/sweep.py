@@ -0,0 +1,45 @@
+import numpy as np
+from bandits import BatchBandit
+from agents import *
+from randomness import BufferedRandomness
+
+# agent class -> (batch agent class, name of the hyperparameter that is swept)
+SWEEPS = {
+    GreedyAgent: (BatchGreedyAgent, "initial_value"),
+    EpsilonGreedyAgent: (BatchEpsilonGreedyAgent, "epsilon"),
+    UCBAgent: (BatchUCBAgent, "exploration_param"),
+    GradientBanditAgent: (BatchGradientBanditAgent, "learning_rate"),
+}
+
+def sweep(agent_class, values, runs_per_value: int, n: int, bandit_type: str = "Bernoulli", steps: int = 1000, seed=None) -> np.ndarray:
+    '''Runs a whole parameter study in one vectorized pass: the grid of hyperparameter values is an extra batch axis,
+    so every (value, run) pair is one run of a single BatchBandit with its own bandit instance.
+
+    Returns a (len(values), 3) table with columns: value, mean final regret, standard error of the mean.'''
+    batch_class, param = SWEEPS[agent_class]
+    values = np.asarray(values, dtype=float)
+
+    if seed is not None:
+        # the bandit instances are drawn from the global generator, like in runner.run_job
+        np.random.seed(seed)
+    bandit = BatchBandit(n, bandit_type, len(values) * runs_per_value, randomness=BufferedRandomness(seed))
+    # run r uses values[r // runs_per_value]
+    agent = batch_class(bandit, **{param: np.repeat(values, runs_per_value)})
+    for _ in range(steps):
+        agent.act()
+
+    final_regret = bandit.get_regret().reshape(len(values), runs_per_value)
+    mean = final_regret.mean(axis=1)
+    stderr = final_regret.std(axis=1) / np.sqrt(runs_per_value)
+    return np.column_stack([values, mean, stderr])
+
+def format_table(table: np.ndarray, param: str) -> str:
+    lines = [f"{param:>18} {'final regret':>14} {'+/-':>10}"]
+    for value, mean, stderr in table:
+        lines.append(f"{value:>18.4g} {mean:>14.2f} {stderr:>10.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    epsilons = np.linspace(0, 0.5, 50)
+    table = sweep(EpsilonGreedyAgent, epsilons, runs_per_value=500, n=10, steps=1000, seed=0)
+    print(format_table(table, "epsilon"))
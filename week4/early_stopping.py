@@ -0,0 +1,45 @@
+import numpy as np
+import tqdm
+from evaluation import evaluate_policy
+
+class EarlyStopping:
+    '''Every `interval` episodes, scores the greedy policy on held-out seeds (never used for training) and asks training
+    to stop once the last `window` scores all reach target_success (success rate) and, if given, target_return
+    (mean return).
+
+    With adapt_epsilon, epsilon is also reset after every evaluation to max_epsilon * (1 - success rate), at least
+    the agent's epsilon_min, and keeps decaying from there. It explores less as the policy starts solving the task,
+    and more again if it stops doing so.'''
+
+    def __init__(self, env_name: str, interval: int = 100, seeds=range(10**6, 10**6 + 200), target_success: float = 0.95,
+                 target_return=None, window: int = 3, adapt_epsilon: bool = False, max_epsilon: float = 1.0) -> None:
+        self.env_name = env_name
+        self.interval = interval
+        self.seeds = seeds
+        self.target_success = target_success
+        self.target_return = target_return
+        self.window = window
+        self.adapt_epsilon = adapt_epsilon
+        self.max_epsilon = max_epsilon
+        self.history = []
+
+    def reached(self, result: dict) -> bool:
+        return (result["success_rate"] >= self.target_success
+                and (self.target_return is None or result["mean_return"] >= self.target_return))
+
+    def update(self, episode: int, agent) -> bool:
+        '''Called after every training episode; returns True when training should stop'''
+        if episode % self.interval:
+            return False
+        result = evaluate_policy(agent.greedy_policy(), self.env_name, self.seeds)
+        result = {"episode": episode, **{key: float(result[key]) for key in ("success_rate", "mean_return", "mean_length")}}
+        self.history.append(result)
+        if self.adapt_epsilon:
+            agent.epsilon = max(agent.epsilon_min, self.max_epsilon * (1 - result["success_rate"]))
+
+        recent = self.history[-self.window:]
+        stop = len(recent) == self.window and all(self.reached(r) for r in recent)
+        if stop:
+            tqdm.tqdm.write(f"stopping at episode {episode}: success rate {np.mean([r['success_rate'] for r in recent]):.2f} "
+                            f"and mean return {np.mean([r['mean_return'] for r in recent]):.1f} over the last {self.window} evaluations")
+        return stop
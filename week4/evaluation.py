@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import gymnasium as gym
+import numpy as np
+from mountain_car_env import MountainCarBatch
+
+class GreedyPolicy:
+    # Frozen copy of a QAgent's values (q_values, or tile weights when tile_coder is given), cheap to send to a worker
+    def __init__(self, values, discretizer=None, tile_coder=None) -> None:
+        self.values = values
+        self.discretizer = discretizer
+        self.tile_coder = tile_coder
+
+    def actions(self, states):
+        if self.tile_coder is not None:
+            return np.argmax(self.values[self.tile_coder.features(states)].sum(axis=-2), axis=-1)
+        return np.argmax(self.values[self.discretizer.indices(states)], axis=-1)
+
+def evaluate_policy(policy: GreedyPolicy, env_name: str, seeds, record_dir=None, record_episodes: int = 0) -> dict:
+    '''Runs one greedy episode per seed, all seeds in one vectorized batch (the native MountainCar for
+    MountainCar-v0, which reproduces gymnasium's episodes exactly), and returns the success rate (terminated before
+    the time limit), mean episode length and mean return. The first record_episodes seeds are replayed headless with
+    render_mode="rgb_array" and saved as GIFs in record_dir.'''
+    seeds = np.asarray(seeds)
+    if env_name == "MountainCar-v0" and np.array_equal(seeds, np.arange(seeds[0], seeds[0] + len(seeds))):
+        envs = MountainCarBatch(len(seeds), int(seeds[0]))
+    else:
+        from mountain_car import EnvBatch
+        envs = EnvBatch(env_name, len(seeds))
+        envs.reset = lambda: np.array([env.reset(seed=int(seed))[0] for env, seed in zip(envs.envs, seeds)])
+
+    states = envs.reset()
+    running = np.ones(len(seeds), dtype=bool)
+    returns = np.zeros(len(seeds))
+    lengths = np.zeros(len(seeds), dtype=int)
+    successes = np.zeros(len(seeds), dtype=bool)
+    while running.any():
+        _, rewards, terminated, truncated, states = envs.step(policy.actions(states))
+        returns += np.where(running, rewards, 0)
+        lengths += running
+        successes |= running & terminated
+        running &= ~(terminated | truncated)
+
+    recordings = []
+    if record_dir is not None:
+        os.makedirs(record_dir, exist_ok=True)
+        for seed in seeds[:record_episodes].tolist():
+            recordings.append(record_episode(policy, env_name, seed, os.path.join(record_dir, f"seed{seed}.gif")))
+
+    return {"episodes": len(seeds), "success_rate": successes.mean(), "mean_length": lengths.mean(),
+            "mean_return": returns.mean(), "returns": returns, "recordings": recordings}
+
+def record_episode(policy: GreedyPolicy, env_name: str, seed: int, path: str) -> str:
+    from PIL import Image
+
+    env = gym.make(env_name, render_mode="rgb_array")
+    state, _ = env.reset(seed=seed)
+    frames, done = [env.render()], False
+    while not done:
+        state, _, terminated, truncated, _ = env.step(int(policy.actions(state)))
+        frames.append(env.render())
+        done = terminated or truncated
+    env.close()
+
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=33, loop=0)
+    return path
+
+class BackgroundEvaluator:
+    '''Evaluates policy snapshots in one worker process so that training never waits for it. While an evaluation
+    is still running, newer submissions are skipped instead of queued, so the results never fall behind training.'''
+
+    def __init__(self, env_name: str, seeds, record_dir=None, record_episodes: int = 0) -> None:
+        self.env_name = env_name
+        self.seeds = seeds
+        self.record_dir = record_dir
+        self.record_episodes = record_episodes
+        self.executor = ProcessPoolExecutor(max_workers=1)
+        self.pending = None
+        self.results = []
+        self.unreported = []  # finished, but not yet returned by poll or close
+
+    def collect(self) -> None:
+        # moves a finished evaluation out of pending without reporting it
+        if self.pending is None or not self.pending[1].done():
+            return
+        episode, future = self.pending
+        self.pending = None
+        result = {"episode": episode, **future.result()}
+        self.results.append(result)
+        self.unreported.append(result)
+
+    def submit(self, episode: int, policy: GreedyPolicy) -> bool:
+        self.collect()
+        if self.pending is not None:
+            return False
+        record_dir = None if self.record_dir is None else os.path.join(self.record_dir, f"episode{episode}")
+        future = self.executor.submit(evaluate_policy, policy, self.env_name, self.seeds, record_dir, self.record_episodes)
+        self.pending = (episode, future)
+        return True
+
+    def poll(self) -> list:
+        '''Returns the evaluations that finished since the last call'''
+        self.collect()
+        finished, self.unreported = self.unreported, []
+        return finished
+
+    def close(self) -> list:
+        '''Waits for the running evaluation, if any, and shuts the worker down'''
+        if self.pending is not None:
+            self.pending[1].result()
+        finished = self.poll()
+        self.executor.shutdown()
+        return finished
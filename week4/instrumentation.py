@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import os
+
+class TrainingLog:
+    '''Streams one record (a flat dict) per training episode to path, as CSV if path ends with .csv and as JSON lines
+    otherwise. Records are buffered and written every flush_every records; once the file reaches max_bytes it is
+    rotated like logging's RotatingFileHandler (path -> path.1 -> ... -> path.backup_count, the oldest dropped).'''
+
+    def __init__(self, path: str, max_bytes: int = 10 << 20, backup_count: int = 5, flush_every: int = 100) -> None:
+        self.path = path
+        self.csv = path.endswith(".csv")
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_every = flush_every
+        self.fields = None
+        self.lines = []
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "w", newline="")
+
+    def format(self, record: dict) -> str:
+        if not self.csv:
+            return json.dumps(record) + "\n"
+        if self.fields is None:
+            self.fields = list(record)
+        line = io.StringIO()
+        csv.writer(line).writerow([record.get(field, "") for field in self.fields])
+        return line.getvalue()
+
+    def write(self, record: dict) -> None:
+        if self.csv and self.file.tell() == 0 and not self.lines:
+            self.lines.append(",".join(self.fields or list(record)) + "\r\n")
+        self.lines.append(self.format(record))
+        if len(self.lines) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.write("".join(self.lines))
+        self.file.flush()
+        self.lines = []
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "w", newline="")
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -300,12 +300,105 @@
 import gymnasium as gym
 import numpy as np
 import matplotlib.pyplot as plt
+import time
 import tqdm
+from mountain_car_env import NativeMountainCar, MountainCarBatch
+from evaluation import GreedyPolicy, BackgroundEvaluator
+from instrumentation import TrainingLog
+from planning import PrioritizedSweeping
+from value_iteration import plan_q_table
+from sparse_table import SparseQTable
+
+class EnvBatch:
+    # N copies of a gym env stepped in lockstep; a finished env is reset right away
+    def __init__(self, env_name: str, num_envs: int, seed=None) -> None:
+        self.envs = [gym.make(env_name) for _ in range(num_envs)]
+        self.num_envs = num_envs
+        self.seed = seed
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+
+    def reset(self):
+        seeds = [None] * self.num_envs if self.seed is None else [self.seed + i for i in range(self.num_envs)]
+        self.states = np.array([env.reset(seed=seed)[0] for env, seed in zip(self.envs, seeds)])
+        return self.states
+
+    def step(self, actions):
+        # returns the true next states (for the TD targets) and the states to continue from, where
+        # finished envs have already been reset
+        results = [env.step(int(action)) for env, action in zip(self.envs, actions)]
+        next_states = np.array([result[0] for result in results])
+        rewards = np.array([result[1] for result in results])
+        terminated = np.array([result[2] for result in results])
+        truncated = np.array([result[3] for result in results])
+
+        self.states = next_states.copy()
+        for i in np.flatnonzero(terminated | truncated):
+            self.states[i] = self.envs[i].reset()[0]
+        return next_states, rewards, terminated, truncated, self.states
+
+class Discretizer:
+    # Maps observations to flat grid cell indices, row-major like np.ravel_multi_index over sizes
+    def __init__(self, low, high, sizes) -> None:
+        self.low = np.asarray(low, dtype=float)
+        self.sizes = np.asarray(sizes)
+        self.scale = self.sizes / (np.asarray(high, dtype=float) - self.low)
+        self.max_index = self.sizes - 1
+        self.strides = np.cumprod(np.append(self.sizes[1:], 1)[::-1])[::-1]
+        self.num_cells = int(np.prod(self.sizes))
+        # plain Python copies for the single observation path, where NumPy call overhead dominates
+        self.dims = list(zip(self.low.tolist(), self.scale.tolist(), self.sizes.tolist()))
+
+    def index(self, state) -> int:
+        flat = 0
+        for x, (low, scale, size) in zip(state.tolist(), self.dims):
+            i = int((x - low) * scale)
+            flat = flat * size + (0 if i < 0 else size - 1 if i >= size else i)
+        return flat
+
+    def indices(self, states):
+        cells = ((states - self.low) * self.scale).astype(int)
+        return np.clip(cells, 0, self.max_index) @ self.strides
+
+class TileCoder:
+    # num_tilings grids of tiles_per_dim tiles per dimension, each shifted by a fraction of a tile along the
+    # asymmetric displacement (1, 3, 5, ...) suggested by Sutton and Barto. A state activates one tile per tiling,
+    # so it is encoded by num_tilings feature indices
+    def __init__(self, low, high, tiles_per_dim: int = 8, num_tilings: int = 8) -> None:
+        low = np.asarray(low, dtype=float)
+        dims = len(low)
+        self.low = low
+        self.scale = tiles_per_dim / (np.asarray(high, dtype=float) - low)
+        self.num_tilings = num_tilings
+        # offsets reach up to one tile, so every tiling needs one extra tile per dimension
+        self.tiles = tiles_per_dim + 1
+        self.tiles_per_tiling = self.tiles ** dims
+        self.num_features = num_tilings * self.tiles_per_tiling
+        displacement = 2 * np.arange(dims) + 1
+        self.offsets = (np.arange(num_tilings)[:, None] * displacement % num_tilings) / num_tilings
+        self.strides = self.tiles ** np.arange(dims)[::-1]
+        self.tiling_starts = np.arange(num_tilings) * self.tiles_per_tiling
+
+    def features(self, states):
+        # (..., dims) states -> (..., num_tilings) active feature indices
+        coords = ((np.asarray(states)[..., None, :] - self.low) * self.scale + self.offsets).astype(int)
+        return np.clip(coords, 0, self.tiles - 1) @ self.strides + self.tiling_starts
 
 class QAgent:
-    def __init__(self, env_name: str) -> None:
+    APPROXIMATORS = ("table", "tiles", "sparse")
+
+    def __init__(self, env_name: str, backend: str = "gym", approximator: str = "table", planning_steps: int = 0,
+                 discrete_sizes=None) -> None:
+        # backend="native" trains on the in-process NumPy MountainCar (mountain_car_env.py) instead of gym.make;
+        # evaluation with rendering always uses gymnasium.
+        # approximator="tiles" replaces the q_table by a linear function of tile-coded features, and
+        # approximator="sparse" stores only the visited cells of the grid (sparse_table.py), for fine grids.
+        # planning_steps > 0 adds that many prioritized-sweeping backups from a learned model per real step (planning.py)
+        assert backend == "gym" or env_name == "MountainCar-v0", "the native backend only implements MountainCar-v0"
+        assert approximator in QAgent.APPROXIMATORS, f"approximator must be one of {QAgent.APPROXIMATORS}"
         self.env_name = env_name
-        self.env = gym.make(env_name)
+        self.backend = backend
+        self.env = self.make_env()
         self.state, _ = self.env.reset()
         
         self.observation_space_size = len(self.state)
@@ -315,7 +408,7 @@ class QAgent:
         self.observation_space_high = self.env.observation_space.high
         
         # Hyperparameters
-        self.discrete_sizes = [25, 25]
+        self.discrete_sizes = [25, 25] if discrete_sizes is None else list(discrete_sizes)
         self.alpha = 0.1
         self.gamma = 0.95
         self.num_train_episodes = 25000
@@ -323,73 +416,272 @@ class QAgent:
         self.epsilon_min = 0.01
         self.epsilon_decay = 0.995
         
-        self.q_table = np.random.uniform(low=-2, high=0, size=(*self.discrete_sizes, self.actions))
-        
+        self.discretizer = Discretizer(self.observation_space_low, self.observation_space_high, self.discrete_sizes)
+        if approximator == "sparse":
+            # no dense q_table: rows are allocated, with the same random initial values, when a cell is first visited
+            self.q_table = None
+            self.q_values = SparseQTable(self.discretizer.num_cells, self.actions, low=-2, high=0)
+        elif approximator == "tiles":
+            # the tile weights below hold all the values
+            self.q_table = self.q_values = None
+        else:
+            self.q_table = np.random.uniform(low=-2, high=0, size=(*self.discrete_sizes, self.actions))
+            # one row of action values per grid cell, a view of q_table indexed by Discretizer's flat indices
+            self.q_values = self.q_table.reshape(-1, self.actions)
+
+        # Tile coding: Q(s, a) is the sum of weights[f, a] over the active features f of s, and memory grows with
+        # num_tilings * tiles_per_dim^2 instead of the grid resolution
+        self.tile_coder = None
+        if approximator == "tiles":
+            self.num_tilings = 8
+            self.tiles_per_dim = 8
+            self.tile_alpha = 0.5  # split over the num_tilings active weights
+            self.tile_coder = TileCoder(self.observation_space_low, self.observation_space_high, self.tiles_per_dim, self.num_tilings)
+            # zero is optimistic for MountainCar's -1 rewards, which drives exploration
+            self.weights = np.zeros((self.tile_coder.num_features, self.actions))
+        self.planner = PrioritizedSweeping(self, planning_steps) if planning_steps > 0 else None
+        self.set_state(self.state)
+        
+    def plan(self, samples_per_dim=4, gamma=None):
+        # fills q_table by value iteration over the known MountainCar dynamics (value_iteration.py), e.g. to warm-start
+        # training or to watch with agent_eval without training
+        return plan_q_table(self, samples_per_dim, gamma)
+
+    def make_env(self):
+        return NativeMountainCar() if self.backend == "native" else gym.make(self.env_name)
+
+    def make_env_batch(self, num_envs, seed=None):
+        return MountainCarBatch(num_envs, seed) if self.backend == "native" else EnvBatch(self.env_name, num_envs, seed)
+
     def get_state_index(self, state):
-        ratios = (state - self.observation_space_low) / (self.observation_space_high - self.observation_space_low)
-        indices = (ratios * np.array(self.discrete_sizes)).astype(int)
-        return tuple(np.clip(indices, 0, np.array(self.discrete_sizes) - 1))
+        # flat index of the state's grid cell, i.e. its row in q_values, or its active tiles under tile coding
+        if self.tile_coder is not None:
+            return self.tile_coder.features(state)
+        return self.discretizer.index(state)
     
+    def get_state_indices(self, states):
+        if self.tile_coder is not None:
+            return self.tile_coder.features(states)
+        return self.discretizer.indices(states)
+
+    def action_values(self, state_indices):
+        # action values of one state index or of a batch of them
+        if self.tile_coder is not None:
+            return self.weights[state_indices].sum(axis=-2)
+        return self.q_values[state_indices]
+
+    def set_state(self, state):
+        # called with the first state of every episode
+        self.state = state
+        self.state_index = self.get_state_index(state)
+        self.episode_return = 0.0
+        self.episode_length = 0
+
     def update(self, state, action, reward, next_state, is_terminal):
-        state_index = self.get_state_index(state)
-        next_state_index = self.get_state_index(next_state)
-        
-        best_future_q = 0 if is_terminal else np.max(self.q_table[next_state_index])
+        self.update_index(self.get_state_index(state), action, reward, self.get_state_index(next_state), is_terminal)
+
+    def learn(self, state_index, action, reward, next_state_index, is_terminal):
+        # TD update from one real transition, followed by the planning backups it triggers
+        self.update_index(state_index, action, reward, next_state_index, is_terminal)
+        if self.planner is not None:
+            self.planner.observe(state_index, action, reward, next_state_index, is_terminal)
+
+    def update_index(self, state_index, action, reward, next_state_index, is_terminal):
+        best_future_q = 0 if is_terminal else self.action_values(next_state_index).max()
         td_target = reward + self.gamma * best_future_q
-        td_error = td_target - self.q_table[state_index][action]
+        td_error = td_target - self.action_values(state_index)[action]
         
-        self.q_table[state_index][action] += self.alpha * td_error
+        if self.tile_coder is not None:
+            self.weights[state_index, action] += self.tile_alpha / self.num_tilings * td_error
+            return
+        self.q_values[state_index, action] += self.alpha * td_error
     
+    def update_batch(self, states, actions, rewards, next_states, is_terminal):
+        state_indices = self.get_state_indices(states)
+        next_state_indices = self.get_state_indices(next_states)
+
+        best_future_q = np.where(is_terminal, 0, np.max(self.action_values(next_state_indices), axis=1))
+        td_errors = rewards + self.gamma * best_future_q - self.action_values(state_indices)[np.arange(len(actions)), actions]
+
+        if self.tile_coder is not None:
+            # linear weights: the gradient steps of all envs are summed, shared features included
+            flat_weights = self.weights.reshape(-1)
+            flat_indices = (state_indices * self.actions + actions[:, None]).reshape(-1)
+            unique_indices, inverse = np.unique(flat_indices, return_inverse=True)
+            step = self.tile_alpha / self.num_tilings * np.repeat(td_errors, self.num_tilings)
+            flat_weights[unique_indices] += np.bincount(inverse, weights=step)
+        else:
+            # Several envs can update the same (state, action) in one batch. Fancy-index assignment would keep only
+            # one of them, so the updates are grouped: k updates with mean TD error d move the value by
+            # (1 - (1 - alpha)^k) * d, which is what k sequential updates towards the same target would do.
+            flat_indices = state_indices * self.actions + actions
+            unique_indices, inverse, counts = np.unique(flat_indices, return_inverse=True, return_counts=True)
+            mean_td_errors = np.bincount(inverse, weights=td_errors) / counts
+            cells, cell_actions = np.divmod(unique_indices, self.actions)
+            self.q_values[cells, cell_actions] += (1 - (1 - self.alpha) ** counts) * mean_td_errors
+
+        if self.planner is not None:
+            # the model learns from every env's transition, each followed by its planning backups as in env_step
+            for transition in zip(state_indices.tolist(), actions.tolist(), rewards.tolist(),
+                                  next_state_indices.tolist(), is_terminal.tolist()):
+                self.planner.observe(*transition)
+
+    def get_actions(self, states):
+        greedy_actions = np.argmax(self.action_values(self.get_state_indices(states)), axis=1)
+        random_actions = np.random.randint(0, self.actions, len(states))
+        return np.where(np.random.rand(len(states)) < self.epsilon, random_actions, greedy_actions)
+
     def get_action(self):
-        state_index = self.get_state_index(self.state)
         if np.random.rand() < self.epsilon:
             return self.env.action_space.sample()
         else:
-            return np.argmax(self.q_table[state_index])
+            return np.argmax(self.action_values(self.state_index))
     
-    def env_step(self):
-        action = self.get_action()
-        next_state, reward, terminated, truncated, _ = self.env.step(action)
-        
-        self.update(self.state, action, reward, next_state, terminated and not truncated)
+    def env_step(self, times=None):
+        # every observation is discretized once: its index is the next-state index of this update and the state
+        # index of the next step.
+        # With times (a dict), the seconds spent in each phase are added to it; only logged training passes one
+        if times is None:
+            action = self.get_action()
+            next_state, reward, terminated, truncated, _ = self.env.step(action)
+            next_state_index = self.get_state_index(next_state)
+            self.learn(self.state_index, action, reward, next_state_index, terminated and not truncated)
+        else:
+            start = time.perf_counter()
+            action = self.get_action()
+            after_action = time.perf_counter()
+            next_state, reward, terminated, truncated, _ = self.env.step(action)
+            after_env = time.perf_counter()
+            next_state_index = self.get_state_index(next_state)
+            after_discretize = time.perf_counter()
+            self.learn(self.state_index, action, reward, next_state_index, terminated and not truncated)
+            after_update = time.perf_counter()
+            times["action"] += after_action - start
+            times["env"] += after_env - after_action
+            times["discretize"] += after_discretize - after_env
+            times["update"] += after_update - after_discretize
         
         self.state = next_state
+        self.state_index = next_state_index
+        self.episode_return += reward
+        self.episode_length += 1
         
         return terminated or truncated
     
+    def greedy_policy(self):
+        # snapshot of the current values for evaluation in another process
+        if self.tile_coder is not None:
+            return GreedyPolicy(self.weights.copy(), tile_coder=self.tile_coder)
+        return GreedyPolicy(self.q_values.copy(), discretizer=self.discretizer)
+
+    def report_evaluations(self, results):
+        for result in results:
+            self.eval_results.append(result)
+            tqdm.tqdm.write(f"episode {result['episode']}: success rate {result['success_rate']:.2f}, "
+                            f"mean length {result['mean_length']:.1f}, mean return {result['mean_return']:.1f}")
+
     def agent_eval(self):
+        # watch one greedy episode in a window; training evaluates headless in the background instead
         eval_env = gym.make(self.env_name, render_mode="human")
         done = False
         eval_state, _ = eval_env.reset()
         
         while not done:
-            action = np.argmax(self.q_table[self.get_state_index(eval_state)])
+            action = np.argmax(self.action_values(self.get_state_index(eval_state)))
             eval_state, _, terminated, truncated, _ = eval_env.step(action)
             eval_env.render()
             done = terminated or truncated
 
         eval_env.close()
 
-    def train(self, eval_intervals):
-        rewards = []  # To store the rewards over episodes for visualization
+    def train(self, eval_intervals, eval_seeds=range(100), record_dir=None, record_episodes=0, log_path=None, early_stopping=None):
+        # every eval_intervals episodes a snapshot of the policy is evaluated on eval_seeds in a background process;
+        # results are printed and collected in self.eval_results as they arrive.
+        # With log_path, one record per episode (return, length, epsilon, steps/sec and the time spent selecting
+        # actions, stepping the env, discretizing and updating) is streamed to a rotating JSONL or .csv file.
+        # early_stopping (an early_stopping.EarlyStopping) can end training before num_train_episodes.
+        rewards = []  # To store the returns over episodes for visualization
+        self.eval_results = []
+        evaluator = BackgroundEvaluator(self.env_name, eval_seeds, record_dir, record_episodes)
+        log = None if log_path is None else TrainingLog(log_path)
+        self.set_state(self.state)
+        train_start = time.perf_counter()
 
         for episode in tqdm.tqdm(range(1, self.num_train_episodes + 1)):
             done = False
-            episode_reward = 0
+            phase_times = None
+            if log is not None:
+                phase_times = dict.fromkeys(("action", "env", "discretize", "update"), 0.0)
+                episode_start = time.perf_counter()
 
             while not done:
-                done = self.env_step()
-                episode_reward += 1  # You can customize reward tracking as per the environment
-
-            rewards.append(episode_reward)
-            self.state, _ = self.env.reset()
+                done = self.env_step(phase_times)
+
+            rewards.append(self.episode_return)
+            if log is not None:
+                duration = time.perf_counter() - episode_start
+                log.write({"episode": episode, "return": self.episode_return, "length": self.episode_length,
+                           "epsilon": self.epsilon, "steps_per_sec": self.episode_length / duration,
+                           **{f"time_{phase}": t for phase, t in phase_times.items()},
+                           "time_episode": duration, "elapsed": time.perf_counter() - train_start})
+            self.set_state(self.env.reset()[0])
             self.epsilon = max(self.epsilon_min, self.epsilon * self.epsilon_decay)
             
             if episode % eval_intervals == 0:
-                self.agent_eval()
+                evaluator.submit(episode, self.greedy_policy())
+            self.report_evaluations(evaluator.poll())
+            if early_stopping is not None and early_stopping.update(episode, self):
+                break
+
+        self.report_evaluations(evaluator.close())
+        if log is not None:
+            log.close()
+        self.plot_training_progress(rewards)
 
+    def train_vectorized(self, num_envs, eval_intervals, seed=None, eval_seeds=range(100), record_dir=None, record_episodes=0,
+                         early_stopping=None):
+        # Same schedule as train (num_train_episodes episodes, epsilon decayed once per finished episode), but
+        # num_envs envs are stepped in lockstep and every step applies one batched TD update
+        envs = self.make_env_batch(num_envs, seed)
+        self.eval_results = []
+        evaluator = BackgroundEvaluator(self.env_name, eval_seeds, record_dir, record_episodes)
+        states = envs.reset()
+        episode_rewards = np.zeros(num_envs)
+        rewards = []
+        episodes = 0
+        stopped = False
+
+        with tqdm.tqdm(total=self.num_train_episodes) as progress:
+            while episodes < self.num_train_episodes and not stopped:
+                actions = self.get_actions(states)
+                next_states, step_rewards, terminated, truncated, reset_states = envs.step(actions)
+                self.update_batch(states, actions, step_rewards, next_states, terminated & ~truncated)
+                states = reset_states
+
+                episode_rewards += step_rewards
+                for i in np.flatnonzero(terminated | truncated):
+                    rewards.append(episode_rewards[i])
+                    episode_rewards[i] = 0
+                    episodes += 1
+                    progress.update(1)
+                    self.epsilon = max(self.epsilon_min, self.epsilon * self.epsilon_decay)
+                    if episodes % eval_intervals == 0:
+                        evaluator.submit(episodes, self.greedy_policy())
+                    if early_stopping is not None and early_stopping.update(episodes, self):
+                        stopped = True
+                        break
+                self.report_evaluations(evaluator.poll())
+
+        self.report_evaluations(evaluator.close())
         self.plot_training_progress(rewards)
 
+    def train_parallel(self, num_workers, eval_intervals, seed=None, eval_seeds=range(100), record_dir=None, record_episodes=0):
+        # Hogwild-style: num_workers processes with their own envs update one shared table without locks
+        # (see parallel.py); returns nothing, like train, and plots the episode returns
+        from parallel import train_hogwild
+        returns = train_hogwild(self, num_workers, eval_intervals, seed, eval_seeds, record_dir, record_episodes)
+        self.plot_training_progress(returns.T.reshape(-1))
+
     def plot_training_progress(self, rewards):
         plt.figure(figsize=(12, 6))
         plt.plot(rewards, color='royalblue', linewidth=2, label='Episode Rewards')
@@ -401,5 +693,8 @@ class QAgent:
         plt.show()
 
 if __name__ == "__main__":
+    from utils import save_checkpoint
+
     agent = QAgent("MountainCar-v0")
     agent.train(eval_intervals=1000)
+    save_checkpoint(agent, "checkpoints/latest.qtable")  # scored by mountain.py
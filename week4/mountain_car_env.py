@@ -0,0 +1,141 @@
+import math
+import gymnasium as gym
+import numpy as np
+
+'''
+In-process MountainCar-v0 without gymnasium's wrapper stack (TimeLimit, OrderEnforcing, env checker).
+
+The dynamics, reward (-1 per step), termination (position >= 0.5 and velocity >= goal_velocity) and truncation after
+200 steps follow gymnasium's MountainCarEnv exactly, and the start position is drawn like gymnasium does, so a seeded
+env reproduces the trajectories of gym.make("MountainCar-v0") reset with the same seed. Run this file to check that.
+'''
+
+MIN_POSITION = -1.2
+MAX_POSITION = 0.6
+MAX_SPEED = 0.07
+GOAL_POSITION = 0.5
+FORCE = 0.001
+GRAVITY = 0.0025
+MAX_EPISODE_STEPS = 200
+
+LOW = np.array([MIN_POSITION, -MAX_SPEED], dtype=np.float32)
+HIGH = np.array([MAX_POSITION, MAX_SPEED], dtype=np.float32)
+
+def dynamics(position, velocity, actions, goal_velocity=0):
+    '''One MountainCar step on float64 arrays, in gymnasium's operation order so that the results are identical.
+    Returns the next position, velocity and whether the goal was reached.'''
+    velocity = velocity + ((np.asarray(actions) - 1) * FORCE + np.cos(3 * position) * (-GRAVITY))
+    velocity = np.clip(velocity, -MAX_SPEED, MAX_SPEED)
+    position = np.clip(position + velocity, MIN_POSITION, MAX_POSITION)
+    velocity = np.where((position == MIN_POSITION) & (velocity < 0), 0.0, velocity)
+    terminated = (position >= GOAL_POSITION) & (velocity >= goal_velocity)
+    return position, velocity, terminated
+
+class NativeMountainCar:
+    # Single env with the gymnasium API, on Python floats
+    def __init__(self, goal_velocity=0, max_episode_steps=MAX_EPISODE_STEPS) -> None:
+        self.goal_velocity = goal_velocity
+        self.max_episode_steps = max_episode_steps
+        self.observation_space = gym.spaces.Box(LOW, HIGH, dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(3)
+        self.np_random = None
+
+    def reset(self, seed=None):
+        # same generator as gymnasium's Env.reset: PCG64 seeded through a SeedSequence, kept across unseeded resets
+        if seed is not None or self.np_random is None:
+            self.np_random = np.random.default_rng(seed)
+        self.position = float(self.np_random.uniform(low=-0.6, high=-0.4))
+        self.velocity = 0.0
+        self.elapsed_steps = 0
+        return np.array((self.position, self.velocity), dtype=np.float32), {}
+
+    def step(self, action):
+        velocity = self.velocity + ((action - 1) * FORCE + math.cos(3 * self.position) * (-GRAVITY))
+        velocity = min(max(velocity, -MAX_SPEED), MAX_SPEED)
+        position = min(max(self.position + velocity, MIN_POSITION), MAX_POSITION)
+        if position == MIN_POSITION and velocity < 0:
+            velocity = 0.0
+        self.position, self.velocity = position, velocity
+        self.elapsed_steps += 1
+
+        terminated = position >= GOAL_POSITION and velocity >= self.goal_velocity
+        truncated = self.elapsed_steps >= self.max_episode_steps
+        return np.array((position, velocity), dtype=np.float32), -1.0, terminated, truncated, {}
+
+    def close(self) -> None:
+        pass
+
+class MountainCarBatch:
+    # num_envs cars stepped together on float64 arrays, with the EnvBatch interface: env i is seeded with seed + i
+    # and a finished car is reset right away
+    def __init__(self, num_envs: int, seed=None, goal_velocity=0, max_episode_steps=MAX_EPISODE_STEPS) -> None:
+        self.num_envs = num_envs
+        self.seed = seed
+        self.goal_velocity = goal_velocity
+        self.max_episode_steps = max_episode_steps
+        self.observation_space = gym.spaces.Box(LOW, HIGH, dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(3)
+
+        self.position = np.zeros(num_envs)
+        self.velocity = np.zeros(num_envs)
+        self.elapsed_steps = np.zeros(num_envs, dtype=int)
+
+    def reset_cars(self, cars) -> None:
+        for i in cars:
+            self.position[i] = self.generators[i].uniform(low=-0.6, high=-0.4)
+        self.velocity[cars] = 0.0
+        self.elapsed_steps[cars] = 0
+
+    def observations(self):
+        return np.stack([self.position, self.velocity], axis=1).astype(np.float32)
+
+    def reset(self):
+        self.generators = [np.random.default_rng(None if self.seed is None else self.seed + i) for i in range(self.num_envs)]
+        self.reset_cars(np.arange(self.num_envs))
+        self.states = self.observations()
+        return self.states
+
+    def step(self, actions):
+        self.position, self.velocity, terminated = dynamics(self.position, self.velocity, actions, self.goal_velocity)
+        self.elapsed_steps += 1
+
+        next_states = self.observations()
+        rewards = np.full(self.num_envs, -1.0)
+        truncated = self.elapsed_steps >= self.max_episode_steps
+
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            self.reset_cars(done)
+            self.states = self.observations()
+        else:
+            self.states = next_states
+        return next_states, rewards, terminated, truncated, self.states
+
+def check_against_gymnasium(seeds=range(10), steps=2000, num_envs=8) -> None:
+    '''Raises AssertionError unless the native envs reproduce gymnasium trajectories exactly under random actions'''
+    from mountain_car import EnvBatch
+
+    for seed in seeds:
+        actions = np.random.default_rng(seed).integers(0, 3, steps)
+        gym_env, native_env = gym.make("MountainCar-v0"), NativeMountainCar()
+        gym_state, _ = gym_env.reset(seed=seed)
+        native_state, _ = native_env.reset(seed=seed)
+        assert np.array_equal(gym_state, native_state), (seed, 0)
+        for t, action in enumerate(actions.tolist()):
+            expected = gym_env.step(action)[:4]
+            result = native_env.step(action)[:4]
+            assert np.array_equal(expected[0], result[0]) and expected[1:] == result[1:], (seed, t, expected, result)
+            if expected[2] or expected[3]:
+                assert np.array_equal(gym_env.reset()[0], native_env.reset()[0]), (seed, t)
+
+        gym_batch, native_batch = EnvBatch("MountainCar-v0", num_envs, seed), MountainCarBatch(num_envs, seed)
+        assert np.array_equal(gym_batch.reset(), native_batch.reset()), seed
+        batch_actions = np.random.default_rng(seed).integers(0, 3, (steps, num_envs))
+        for t in range(steps):
+            expected, result = gym_batch.step(batch_actions[t]), native_batch.step(batch_actions[t])
+            for a, b in zip(expected, result):
+                assert np.array_equal(a, b), (seed, t)
+
+if __name__ == "__main__":
+    check_against_gymnasium()
+    print("NativeMountainCar and MountainCarBatch match gymnasium's MountainCar-v0")
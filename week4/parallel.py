@@ -0,0 +1,121 @@
+import time
+from multiprocessing import Process, shared_memory
+import numpy as np
+import tqdm
+from evaluation import BackgroundEvaluator
+
+'''
+Hogwild-style parallel Q-learning: W worker processes each run their own env and epsilon schedule, and all of them
+update one value array held in shared memory without locks. Two workers rarely touch the same (state, action)
+at the same moment, and a lost update there only costs one sample, so the speedup of lock-free updates outweighs it.
+'''
+
+HYPERPARAMETERS = ("alpha", "gamma", "epsilon", "epsilon_min", "epsilon_decay", "tile_alpha", "num_tilings", "tiles_per_dim")
+
+def shared_array(shape, dtype, initial=None):
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array[...] = 0 if initial is None else initial
+    return shm, array
+
+def bind_values(agent, values) -> None:
+    # points the agent's table (or tile weights) at values, so that its updates write to it in place
+    if agent.tile_coder is not None:
+        agent.weights = values
+    else:
+        agent.q_table = values.reshape(agent.q_table.shape)
+        agent.q_values = values
+
+def hogwild_worker(worker, config, names, shape, episodes, seed) -> None:
+    from mountain_car import QAgent, TileCoder
+
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    values = np.ndarray(shape, dtype=float, buffer=blocks[0].buf)
+    progress = np.ndarray(config["num_workers"], dtype=np.int64, buffer=blocks[1].buf)
+    returns = np.ndarray((config["num_workers"], episodes), dtype=float, buffer=blocks[2].buf)
+
+    np.random.seed(None if seed is None else seed + worker)
+    # every worker learns its own model for planning, and its backups write to the shared values
+    agent = QAgent(config["env_name"], config["backend"], config["approximator"], config["planning_steps"],
+                   config["discrete_sizes"])
+    for key, value in config["hyperparameters"].items():
+        setattr(agent, key, value)
+    if agent.tile_coder is not None:
+        # the tiling may differ from QAgent's defaults, and the shared weights are shaped for it
+        agent.tile_coder = TileCoder(agent.observation_space_low, agent.observation_space_high, agent.tiles_per_dim, agent.num_tilings)
+    bind_values(agent, values)
+    agent.env.action_space.seed(None if seed is None else seed + worker)
+    agent.set_state(agent.env.reset(seed=None if seed is None else seed + worker)[0])
+
+    for episode in range(episodes):
+        done = False
+        while not done:
+            done = agent.env_step()
+        returns[worker, episode] = agent.episode_return
+        progress[worker] = episode + 1
+        agent.set_state(agent.env.reset()[0])
+        agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay)
+
+    del values, progress, returns
+    for block in blocks:
+        block.close()
+
+def train_hogwild(agent, num_workers: int, eval_intervals: int, seed=None, eval_seeds=range(100), record_dir=None,
+                  record_episodes: int = 0, poll_interval: float = 0.1):
+    '''Trains agent with num_workers processes that share its values and split its num_train_episodes between them.
+    The main process reports progress and every eval_intervals finished episodes (across all workers) sends a
+    snapshot of the shared values to a BackgroundEvaluator. Returns the episode returns, shaped (workers, episodes),
+    and leaves the learned values in the agent.'''
+    assert agent.tile_coder is not None or agent.q_table is not None, "shared memory needs a dense table"
+    episodes = -(-agent.num_train_episodes // num_workers)
+    own_values = agent.weights if agent.tile_coder is not None else agent.q_values
+    values_block, values = shared_array(own_values.shape, float, own_values)
+    progress_block, progress = shared_array(num_workers, np.int64)
+    returns_block, returns = shared_array((num_workers, episodes), float)
+    blocks = (values_block, progress_block, returns_block)
+
+    config = {"env_name": agent.env_name, "backend": agent.backend, "num_workers": num_workers,
+              "approximator": "tiles" if agent.tile_coder is not None else "table",
+              "planning_steps": 0 if agent.planner is None else agent.planner.planning_steps,
+              "discrete_sizes": agent.discrete_sizes,
+              "hyperparameters": {key: getattr(agent, key) for key in HYPERPARAMETERS if hasattr(agent, key)}}
+    workers = [Process(target=hogwild_worker, args=(worker, config, [b.name for b in blocks], values.shape, episodes, seed))
+               for worker in range(num_workers)]
+    evaluator = BackgroundEvaluator(agent.env_name, eval_seeds, record_dir, record_episodes)
+    agent.eval_results = []
+    bind_values(agent, values)
+
+    try:
+        for worker in workers:
+            worker.start()
+        finished, next_eval = 0, eval_intervals
+        with tqdm.tqdm(total=episodes * num_workers) as bar:
+            while any(worker.is_alive() for worker in workers):
+                time.sleep(poll_interval)
+                total = int(progress.sum())
+                bar.update(total - finished)
+                finished = total
+                if finished >= next_eval:
+                    evaluator.submit(finished, agent.greedy_policy())
+                    next_eval = (finished // eval_intervals + 1) * eval_intervals
+                agent.report_evaluations(evaluator.poll())
+            bar.update(int(progress.sum()) - finished)
+        for worker in workers:
+            worker.join()
+        assert all(worker.exitcode == 0 for worker in workers), "a hogwild worker failed"
+        own_values[...] = values
+        result = returns.copy()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        bind_values(agent, own_values)
+        agent.report_evaluations(evaluator.close())
+        del values, progress, returns
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay ** episodes)
+    return result
@@ -0,0 +1,65 @@
+import heapq
+from collections import defaultdict
+
+class PrioritizedSweeping:
+    '''Model-based planning over the discretized states (prioritized sweeping, Sutton and Barto section 8.4, with
+    Moore and Atkeson's expected backups). The model counts, for every (cell, action), the cells it led to, how often
+    it reached the goal and the rewards it got. After each real step, up to planning_steps (cell, action) pairs are
+    backed up from the model, largest expected change first, and each backup that changes a cell's value by d queues
+    every predecessor with priority P(predecessor -> cell) * d.
+
+    A grid cell covers many continuous states, so the same action can stay in the cell or leave it. Remembering
+    only the last outcome makes most actions self-loops with tied values; the counts keep the exit probabilities.'''
+
+    def __init__(self, agent, planning_steps: int = 10, theta: float = 1e-4) -> None:
+        assert agent.tile_coder is None, "planning needs the tabular q_table"
+        self.agent = agent
+        self.planning_steps = planning_steps
+        self.theta = theta
+        self.next_counts = defaultdict(lambda: defaultdict(int))  # (cell, action) -> next cell -> visits
+        self.totals = {}  # (cell, action) -> [visits, reward sum, terminal visits]
+        self.predecessors = defaultdict(set)  # cell -> (cell, action) pairs that led into it
+        self.queue = []
+        self.queued = {}  # (cell, action) -> priority of its live queue entry; other entries for it are stale
+
+    def push(self, key, priority: float) -> None:
+        if priority > self.theta and priority > self.queued.get(key, 0.0):
+            self.queued[key] = priority
+            heapq.heappush(self.queue, (-priority, key))
+
+    def backup(self, key) -> float:
+        # expected Q-learning target of (cell, action) under the model
+        q_values = self.agent.q_values
+        visits, reward_sum, _ = self.totals[key]
+        future = sum(count * q_values[cell].max() for cell, count in self.next_counts[key].items())
+        return (reward_sum + self.agent.gamma * future) / visits
+
+    def observe(self, state_index, action, reward, next_state_index, is_terminal) -> None:
+        '''Adds a real transition to the model and plans'''
+        key = (state_index, action)
+        totals = self.totals.setdefault(key, [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += reward
+        if is_terminal:
+            totals[2] += 1
+        else:
+            self.next_counts[key][next_state_index] += 1
+            self.predecessors[next_state_index].add(key)
+        q_values = self.agent.q_values
+        self.push(key, abs(self.backup(key) - q_values[key]))
+
+        for _ in range(self.planning_steps):
+            while self.queue and self.queued.get(self.queue[0][1]) != -self.queue[0][0]:
+                heapq.heappop(self.queue)
+            if not self.queue:
+                break
+            _, key = heapq.heappop(self.queue)
+            del self.queued[key]
+            cell = key[0]
+            old_value = q_values[cell].max()
+            q_values[key] = self.backup(key)
+            change = abs(q_values[cell].max() - old_value)
+            if change <= self.theta:
+                continue
+            for predecessor in self.predecessors[cell]:
+                self.push(predecessor, self.next_counts[predecessor][cell] / self.totals[predecessor][0] * change)
@@ -0,0 +1,96 @@
+import sys
+import numpy as np
+
+class SparseQTable:
+    '''Drop-in for QAgent.q_values (a (cells, actions) array) that only stores the cells the agent touches. A dict
+    maps flat cell indices to rows of one growing float32 array; a row is allocated, with the same uniform random
+    initial values as the dense table, the first time its cell is read or written. Supports the indexing QAgent
+    uses: table[cell] (a row view), table[cell, action], table[cells] and table[cells, actions] for index arrays,
+    assignment through all of these, and table[...] = dense values.'''
+
+    def __init__(self, num_cells: int, num_actions: int, low: float = -2.0, high: float = 0.0, capacity: int = 1024) -> None:
+        self.shape = (num_cells, num_actions)
+        self.num_actions = num_actions
+        self.low = low
+        self.high = high
+        self.slots = {}
+        self.rows = np.empty((capacity, num_actions), dtype=np.float32)
+        self.size = 0
+
+    def allocate(self, cell: int) -> int:
+        if self.size == len(self.rows):
+            rows = np.empty((2 * len(self.rows), self.num_actions), dtype=np.float32)
+            rows[:self.size] = self.rows[:self.size]
+            self.rows = rows
+        self.rows[self.size] = np.random.uniform(low=self.low, high=self.high, size=self.num_actions)
+        self.slots[cell] = self.size
+        self.size += 1
+        return self.size - 1
+
+    def slot(self, cell) -> int:
+        slot = self.slots.get(cell)
+        return self.allocate(cell) if slot is None else slot
+
+    def slot_array(self, cells):
+        cells = np.asarray(cells)
+        get = self.slots.get
+        slots = [get(cell) for cell in cells.ravel().tolist()]
+        if None in slots:
+            slots = [self.slot(cell) if slot is None else slot for cell, slot in zip(cells.ravel().tolist(), slots)]
+        return np.array(slots, dtype=np.intp).reshape(cells.shape)
+
+    def rows_for(self, cells):
+        if isinstance(cells, (int, np.integer)):
+            return self.slot(int(cells))
+        return self.slot_array(cells)
+
+    # rows_for may grow self.rows, so slots are looked up before self.rows is read
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            cells, actions = key
+            slots = self.rows_for(cells)
+            return self.rows[slots, actions]
+        slots = self.rows_for(key)
+        return self.rows[slots]
+
+    def __setitem__(self, key, value) -> None:
+        if key is Ellipsis:
+            value = np.broadcast_to(value, self.shape)
+            self.slots = dict(zip(range(self.shape[0]), range(self.shape[0])))
+            self.rows = value.astype(np.float32)
+            self.size = self.shape[0]
+        elif isinstance(key, tuple):
+            cells, actions = key
+            slots = self.rows_for(cells)
+            self.rows[slots, actions] = value
+        else:
+            slots = self.rows_for(key)
+            self.rows[slots] = value
+
+    def copy(self):
+        table = SparseQTable(*self.shape, self.low, self.high, capacity=max(1, self.size))
+        table.slots = dict(self.slots)
+        table.rows[:self.size] = self.rows[:self.size]
+        table.size = self.size
+        return table
+
+    def items(self):
+        '''(cells, rows) of the allocated cells'''
+        cells = np.fromiter(self.slots.keys(), dtype=np.int64, count=len(self.slots))
+        slots = np.fromiter(self.slots.values(), dtype=np.intp, count=len(self.slots))
+        return cells, self.rows[slots]
+
+    @classmethod
+    def from_items(cls, num_cells: int, cells, rows, low: float = -2.0, high: float = 0.0):
+        table = cls(num_cells, rows.shape[1], low, high, capacity=max(1, len(cells)))
+        table.rows[:len(cells)] = rows
+        table.slots = dict(zip(np.asarray(cells).tolist(), range(len(cells))))
+        table.size = len(cells)
+        return table
+
+    def memory_usage(self) -> dict:
+        '''Bytes used by the rows and the index, next to what the dense float64 table would take'''
+        index_bytes = sys.getsizeof(self.slots) + sum(sys.getsizeof(cell) for cell in self.slots) + 28 * len(self.slots)
+        return {"cells": self.size, "fraction_allocated": self.size / self.shape[0], "row_bytes": self.rows.nbytes,
+                "index_bytes": index_bytes, "total_bytes": self.rows.nbytes + index_bytes,
+                "dense_bytes": int(self.shape[0]) * self.shape[1] * 8}
@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+from evaluation import GreedyPolicy, evaluate_policy
+from mountain_car import Discretizer, TileCoder
+from sparse_table import SparseQTable
+
+'''
+Checkpoints are one binary file: an 8 byte magic, a little-endian uint32 header length, a JSON header describing
+the encoder (grid or tiles) and the values array, padded to a 64 byte boundary, then the raw values. load_checkpoint
+memory-maps the values, so opening a checkpoint reads only its header. A sparse table is stored as the rows of its
+visited cells followed by their int64 cell indices.
+'''
+
+MAGIC = b"QTABLE01"
+ALIGNMENT = 64
+
+def save_checkpoint(agent, path: str, dtype=np.float32) -> None:
+    if agent.tile_coder is not None:
+        values = agent.weights
+        encoder = {"kind": "tiles", "tiles_per_dim": agent.tiles_per_dim, "num_tilings": agent.num_tilings}
+    else:
+        values = agent.q_values
+        encoder = {"kind": "grid", "discrete_sizes": list(agent.discrete_sizes)}
+    cells = None
+    if isinstance(values, SparseQTable):
+        cells, values = values.items()
+        encoder["sparse"] = True
+    values = np.ascontiguousarray(values, dtype=dtype)
+    header = {"env_name": agent.env_name, "low": agent.observation_space_low.tolist(),
+              "high": agent.observation_space_high.tolist(), "encoder": encoder,
+              "dtype": values.dtype.str, "shape": list(values.shape)}
+
+    header = json.dumps(header).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    header += b" " * (-offset % ALIGNMENT)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.uint32(len(header)).tobytes())
+        file.write(header)
+        file.write(values.tobytes())
+        if cells is not None:
+            file.write(cells.astype("<i8").tobytes())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path: str):
+    '''Returns (GreedyPolicy over memory-mapped values, header)'''
+    with open(path, "rb") as file:
+        assert file.read(len(MAGIC)) == MAGIC, f"{path} is not a q-table checkpoint"
+        header_size = int(np.frombuffer(file.read(4), dtype="<u4")[0])
+        header = json.loads(file.read(header_size))
+    offset = len(MAGIC) + 4 + header_size
+    values = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r", offset=offset, shape=tuple(header["shape"]))
+
+    encoder = header["encoder"]
+    if encoder["kind"] == "tiles":
+        tile_coder = TileCoder(header["low"], header["high"], encoder["tiles_per_dim"], encoder["num_tilings"])
+        return GreedyPolicy(values, tile_coder=tile_coder), header
+    discretizer = Discretizer(header["low"], header["high"], encoder["discrete_sizes"])
+    if encoder.get("sparse"):
+        cells = np.memmap(path, dtype="<i8", mode="r", offset=offset + values.nbytes, shape=(len(values),))
+        values = SparseQTable.from_items(discretizer.num_cells, cells, values)
+    return GreedyPolicy(values, discretizer=discretizer), header
+
+class EpsilonGreedyPolicy:
+    # acts randomly with probability epsilon, otherwise like policy; seeded, so scores are reproducible
+    def __init__(self, policy: GreedyPolicy, epsilon: float, num_actions: int, seed=None) -> None:
+        self.policy = policy
+        self.epsilon = epsilon
+        self.num_actions = num_actions
+        self.rng = np.random.default_rng(seed)
+
+    def actions(self, states):
+        actions = self.policy.actions(states)
+        if self.epsilon <= 0:
+            return actions
+        random_actions = self.rng.integers(0, self.num_actions, np.shape(actions))
+        return np.where(self.rng.random(np.shape(actions)) < self.epsilon, random_actions, actions)
+
+def inference(pickle_path: str, env_name: str = "MountainCar-v0", epsilon: float = 0.0, min_state_val=None,
+              max_state_val=None, seed: int = 0, save_path=None, learning_mode: str = "Q-learning",
+              num_episodes: int = 1000) -> float:
+    '''Scores a checkpoint written by save_checkpoint: one episode per seed in seed, ..., seed + num_episodes - 1,
+    all in one vectorized batch, acting epsilon-greedily. Returns the mean return; with save_path, the per-episode
+    returns and a summary of their distribution are written there.
+
+    pickle_path keeps its name from week4/mountain.py but points to a save_checkpoint file, not a pickle. The
+    discretization is read from the checkpoint, so min_state_val and max_state_val are not needed, and learning_mode
+    only matters for training; both are accepted for compatibility.'''
+    policy, header = load_checkpoint(pickle_path)
+    assert header["env_name"] == env_name, f"checkpoint was trained on {header['env_name']}, not {env_name}"
+    num_actions = header["shape"][-1]
+    result = evaluate_policy(EpsilonGreedyPolicy(policy, epsilon, num_actions, seed), env_name,
+                             range(seed, seed + num_episodes))
+
+    returns = result["returns"]
+    if save_path is not None:
+        os.makedirs(save_path, exist_ok=True)
+        np.save(os.path.join(save_path, "returns.npy"), returns)
+        summary = {"checkpoint": pickle_path, "env_name": env_name, "epsilon": epsilon, "seed": seed,
+                   "learning_mode": learning_mode, "episodes": num_episodes, "success_rate": result["success_rate"],
+                   "mean_return": returns.mean(), "std_return": returns.std(),
+                   "percentiles": dict(zip(["min", "p5", "p25", "median", "p75", "p95", "max"],
+                                           np.percentile(returns, [0, 5, 25, 50, 75, 95, 100]).tolist()))}
+        with open(os.path.join(save_path, "summary.json"), "w") as file:
+            json.dump({key: float(value) if isinstance(value, np.floating) else value for key, value in summary.items()},
+                      file, indent=2)
+    return float(returns.mean())
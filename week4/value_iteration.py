@@ -0,0 +1,48 @@
+import numpy as np
+from mountain_car_env import dynamics
+
+'''
+MountainCar's dynamics are deterministic and known, so a q_table can be computed instead of learned: every grid cell
+is represented by samples_per_dim^2 evenly spread states, all of them are stepped with every action in one
+vectorized call, and value iteration runs on the resulting cell-to-cell transition table. A cell whose sampled
+states land in different cells gets the average over its samples, i.e. the grid becomes a small stochastic MDP.
+'''
+
+def cell_samples(discretizer, samples_per_dim: int):
+    '''(cells, samples, dims) states spread evenly inside every cell, cells in flat index order'''
+    cells = np.indices(discretizer.sizes).reshape(len(discretizer.sizes), -1).T
+    fractions = (np.arange(samples_per_dim) + 0.5) / samples_per_dim
+    offsets = np.stack(np.meshgrid(*[fractions] * len(discretizer.sizes), indexing="ij"), axis=-1).reshape(-1, len(discretizer.sizes))
+    return discretizer.low + (cells[:, None, :] + offsets) / discretizer.scale
+
+def build_model(discretizer, num_actions: int = 3, samples_per_dim: int = 4):
+    '''Steps every sample of every cell with every action at once. Returns the next cells and whether the goal was
+    reached, both shaped (cells, actions, samples).'''
+    states = cell_samples(discretizer, samples_per_dim)
+    position, velocity = states[:, None, :, 0], states[:, None, :, 1]
+    actions = np.arange(num_actions)[None, :, None]
+    next_position, next_velocity, terminated = dynamics(position, velocity, actions)
+    # the agent sees float32 observations, so next cells are found from those
+    observations = np.stack(np.broadcast_arrays(next_position, next_velocity), axis=-1).astype(np.float32)
+    return discretizer.indices(observations), np.broadcast_to(terminated, observations.shape[:-1])
+
+def value_iteration(next_cells, terminated, gamma: float, reward: float = -1.0, tol: float = 1e-6, max_iterations: int = 10000):
+    '''Returns the (cells, actions) Q-values of the sampled model and the number of sweeps used'''
+    values = np.zeros(next_cells.shape[0])
+    for iteration in range(1, max_iterations + 1):
+        q_values = reward + gamma * np.where(terminated, 0.0, values[next_cells]).mean(axis=-1)
+        new_values = q_values.max(axis=1)
+        delta = np.abs(new_values - values).max()
+        values = new_values
+        if delta < tol:
+            break
+    return q_values, iteration
+
+def plan_q_table(agent, samples_per_dim: int = 4, gamma=None, tol: float = 1e-6) -> int:
+    '''Fills agent.q_table in place with value iteration over its own grid (gamma defaults to agent.gamma), so that
+    agent_eval, evaluation and further training use it directly. Returns the number of sweeps.'''
+    assert agent.env_name == "MountainCar-v0" and agent.tile_coder is None, "the model is MountainCar-v0's grid"
+    next_cells, terminated = build_model(agent.discretizer, agent.actions, samples_per_dim)
+    q_values, iterations = value_iteration(next_cells, terminated, agent.gamma if gamma is None else gamma, tol=tol)
+    agent.q_values[...] = q_values
+    return iterations